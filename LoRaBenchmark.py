@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+%===============================LoRaBenchmark.py===============================%
+Measures how LoRaSimSODAQ.py scales with the number of nodes: the time of
+every phase of the setup (see profiler in LoRaSimSODAQ.py), how many packets
+sendRandomPacket sends per second, the time of run_until_empty and the peak
+memory. Every size runs seeded in its own process, so results of different
+runs can be compared and the peak memory is that of one size only.
+
+USAGE:
+python3 ./LoRaBenchmark.py [--sizes 100,1000,10000,100000] [--seed S]
+                           [--packets P] [--area scaled|fixed] [--density D]
+                           [--out FILE]
+
+    --sizes     numbers of nodes, default 100,1000,10000,100000
+    --seed      seed of every topology, default 0
+    --packets   packets sent one by one with sendRandomPacket, default 10000
+    --area      scaled: the field grows with the number of nodes so there
+                are always --density nodes per field of the default size;
+                fixed: the default field for every size, the number of links
+                then grows with the square of the number of nodes
+    --density   nodes per default field with --area scaled, default 250
+    --out       JSON file to write the results to, default benchmark.json
+
+RESULTS (per size, times in s):
+    setup, placeNodes, linkTable, beaconFromGW, beaconFromNodes, checkSignal,
+    calcTraffic, rebalance      time of the phases of setup()
+    links                       pairs in the link table
+    reroutes                    nodes rerouted by rebalance
+    packetsPerSecond            of sendRandomPacket
+    runUntilEmpty               time of run_until_empty()
+    peakMemoryMB                peak resident memory of the process
+%==============================================================================%
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import platform
+import sys
+import time
+import numpy as np
+
+import LoRaSimSODAQ
+from LoRaSimSODAQ import Simulation, profiler
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+"""arguments of the benchmarked simulations, after numberOfNodes"""
+ARGUMENTS = [14, 7, 1000, 20, 10]
+"""phases of setup() that are reported"""
+PHASES = ['setup', 'placeNodes', 'linkTable', 'beaconFromGW', 'beaconFromNodes',
+          'checkSignal', 'calcTraffic', 'rebalance']
+
+# Func: peakMemory()
+# Returns the peak resident memory of this process.
+# Params:   None
+# returns:  float in MB, None where it can not be measured
+def peakMemory():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    """kB on Linux, bytes on macOS"""
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+# Func: runSize(case)
+# Benchmarks one number of nodes. Used by the worker processes.
+# Params:   dict with 'nodes', 'seed', 'packets', 'side' (width and height of
+#           the field in m)
+# returns:  dict with the results, see RESULTS
+def runSize(case):
+    profiler.reset()
+    profiler.enabled = True
+
+    sim = Simulation(case['nodes'], *ARGUMENTS, seed=case['seed'],
+                     field=(case['side'], case['side']))
+    sim.setup()
+    result = {'nodes': case['nodes'], 'side': case['side']}
+    phases = profiler.summary()['phases']
+    for name in PHASES:
+        result[name] = phases[name]['seconds'] if name in phases else 0.0
+    result['links'] = int(len(sim.links.neighbours))
+    result['reroutes'] = profiler.counters.get('reroutes', 0)
+    profiler.enabled = False
+
+    start = time.perf_counter()
+    for i in range(case['packets']):
+        sim.sendRandomPacket()
+    seconds = time.perf_counter() - start
+    result['packetsPerSecond'] = case['packets'] / seconds if seconds > 0 else None
+
+    start = time.perf_counter()
+    sim.run_until_empty()
+    result['runUntilEmpty'] = time.perf_counter() - start
+    result['peakMemoryMB'] = peakMemory()
+    result.update(sim.stats())
+    return result
+
+# Func: benchmark(sizes, seed, packets, area, density, verbose)
+# Benchmarks every size, each in a new process.
+# Params:   list of numbers of nodes
+#           integer, seed of every topology
+#           number of packets for sendRandomPacket
+#           'scaled' or 'fixed', see USAGE
+#           nodes per default field with area 'scaled'
+#           boolean, True to print every result
+# returns:  dict with the machine, settings and a list of 'results'
+def benchmark(sizes, seed=0, packets=10000, area='scaled', density=250, verbose=False):
+    results = []
+    for nodes in sizes:
+        side = LoRaSimSODAQ.width
+        if area == 'scaled':
+            side = int(round(LoRaSimSODAQ.width * math.sqrt(nodes / density)))
+        case = {'nodes': nodes, 'seed': seed, 'packets': packets, 'side': side}
+        pool = multiprocessing.Pool(1)
+        try:
+            result = pool.apply(runSize, (case,))
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+        results.append(result)
+        if verbose:
+            print("{:>7} nodes: setup {:.2f} s (beacons {:.2f} s, links {}), "
+                  "{:.0f} packets/s, until empty {:.2f} s, {} MB".format(
+                      nodes, result['setup'], result['beaconFromNodes'], result['links'],
+                      result['packetsPerSecond'] or 0, result['runUntilEmpty'],
+                      "?" if result['peakMemoryMB'] is None else int(result['peakMemoryMB'])))
+
+    return {'machine': platform.platform(), 'python': platform.python_version(),
+            'numpy': np.__version__, 'seed': seed, 'packets': packets,
+            'area': area, 'density': density, 'arguments': ARGUMENTS,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results}
+
+# Func: main()
+# Reads the arguments from the command line and runs the benchmark.
+# Params:   None
+# returns:  None
+def main():
+    parser = argparse.ArgumentParser(description="Scaling benchmark of LoRaSimSODAQ.py")
+    parser.add_argument('--sizes', default='100,1000,10000,100000', help="numbers of nodes (default %(default)s)")
+    parser.add_argument('--seed', type=int, default=0, help="seed of every topology (default %(default)s)")
+    parser.add_argument('--packets', type=int, default=10000, help="packets for sendRandomPacket (default %(default)s)")
+    parser.add_argument('--area', choices=['scaled', 'fixed'], default='scaled', help="field size (default %(default)s)")
+    parser.add_argument('--density', type=int, default=250, help="nodes per default field when scaled (default %(default)s)")
+    parser.add_argument('--out', default='benchmark.json', help="JSON file to write (default %(default)s)")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    report = benchmark(sizes, args.seed, args.packets, args.area, args.density, verbose=True)
+    with open(args.out, 'w') as file:
+        json.dump(report, file, indent=2)
+    print("Results written to", args.out)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+%================================LoRaEnsemble.py===============================%
+Runs LoRaSimSODAQ.py on many random topologies with the same arguments and
+reports the mean and intervals of the results, so a single random topology is
+not mistaken for the behaviour of the network. Topologies are made in worker
+processes. Every topology gets its own seed, split from the seed of the
+ensemble, so an ensemble can be repeated exactly.
+
+USAGE:
+python3 ./LoRaEnsemble.py <numberOfNodes> <TXpower> <spreadingFactor> <batteryCapacity> <packetSize> <period>
+                          [--runs R] [--seed S] [--confidence C] [--target T]
+                          [--workers N] [--json FILE]
+
+    --runs          number of topologies, default 100
+    --seed          seed of the ensemble, default 0
+    --confidence    confidence of the intervals, default 0.95
+    --target        stop as soon as the interval of the mean days until the
+                    first battery is empty is narrower than this part of the
+                    mean (0.02 is 2%), after at least 10 topologies
+    --workers       number of worker processes, default number of cores
+    --json          also write the results to this file
+
+RESULTS:
+    lifetimeDays        days until the first battery is empty
+    maxTraffic          most nodes behind a single node
+    outOfRangeFraction  part of the nodes out of range of all other nodes
+    For each: the mean, the interval of the mean (bootstrap percentiles) and
+    the interval the topologies themselves fall in (percentiles).
+%==============================================================================%
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import numpy as np
+
+from LoRaSweep import ARGUMENTS, runScenario
+
+"""results that are summarised"""
+METRICS = ['lifetimeDays', 'maxTraffic', 'outOfRangeFraction']
+"""least number of topologies before stopping early"""
+MIN_RUNS = 10
+"""number of resamples for the interval of the mean"""
+BOOTSTRAPS = 1000
+
+# Func: replicateSeeds(seed, runs)
+# Splits the seed of an ensemble in independent seeds, one per topology.
+# Params:   integer, seed of the ensemble
+#           number of topologies
+# returns:  list of integers
+def replicateSeeds(seed, runs):
+    children = np.random.SeedSequence(seed).spawn(runs)
+    return [int(child.generate_state(1)[0]) for child in children]
+
+# Func: summarise(rows, confidence, seed)
+# Works out mean and intervals of the METRICS over the topologies done.
+# Params:   list of dicts from runScenario
+#           confidence of the intervals, between 0 and 1
+#           integer, seed for the resampling
+# returns:  dict per metric with 'mean', 'meanInterval' and 'interval'
+def summarise(rows, confidence, seed):
+    percentiles = [50 * (1 - confidence), 50 * (1 + confidence)]
+    rng = np.random.RandomState(seed)
+    summary = {}
+    for name in METRICS:
+        if name == 'outOfRangeFraction':
+            values = [row['outOfRange'] / row['numberOfNodes'] for row in rows]
+        else:
+            """lifetime is empty when no node has a route"""
+            values = [row[name] for row in rows if row[name] != '']
+        values = np.array(values, dtype=float)
+        if not len(values):
+            summary[name] = {'mean': None, 'meanInterval': None, 'interval': None}
+            continue
+        means = values[rng.randint(0, len(values), (BOOTSTRAPS, len(values)))].mean(axis=1)
+        summary[name] = {'mean': float(np.mean(values)),
+                         'meanInterval': [float(value) for value in np.percentile(means, percentiles)],
+                         'interval': [float(value) for value in np.percentile(values, percentiles)]}
+    return summary
+
+# Func: converged(summary, target)
+# Checks if the interval of the mean lifetime is narrower than target times
+# the mean.
+# Params:   dict from summarise
+#           float
+# returns:  boolean
+def converged(summary, target):
+    days = summary['lifetimeDays']
+    if days['mean'] is None or days['mean'] == 0:
+        return False
+    low, high = days['meanInterval']
+    return (high - low) / abs(days['mean']) < target
+
+# Func: ensemble(arguments, runs, seed, confidence, target, workers, verbose)
+# Runs topologies with the same arguments and different seeds in a pool of
+# worker processes and summarises the results. Topologies are taken in seed
+# order, so stopping early gives the same result on every machine.
+# Params:   list with the arguments of LoRaSimSODAQ.py, see ARGUMENTS
+#           number of topologies
+#           integer, seed of the ensemble
+#           confidence of the intervals, between 0 and 1
+#           float or None, see converged
+#           number of worker processes, None for the number of cores
+#           boolean, True to print progress
+# returns:  dict with the 'runs' done, 'stoppedEarly' and a summary per
+#           metric, see summarise
+def ensemble(arguments, runs, seed=0, confidence=0.95, target=None, workers=None, verbose=False):
+    todo = []
+    for replicateSeed in replicateSeeds(seed, runs):
+        run = dict(zip(ARGUMENTS, arguments))
+        run['seed'] = replicateSeed
+        todo.append(run)
+
+    rows = []
+    stoppedEarly = False
+    pool = multiprocessing.Pool(workers or os.cpu_count())
+    try:
+        for row in pool.imap(runScenario, todo):
+            rows.append(row)
+            if verbose:
+                print("Topology", len(rows), "of", runs, "done")
+            if target is not None and len(rows) >= MIN_RUNS and len(rows) < runs and\
+               converged(summarise(rows, confidence, seed), target):
+                stoppedEarly = True
+                break
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+    result = {'runs': len(rows), 'stoppedEarly': stoppedEarly}
+    result.update(summarise(rows, confidence, seed))
+    return result
+
+# Func: main()
+# Reads the arguments from the command line and runs the ensemble.
+# Params:   None
+# returns:  None
+def main():
+    parser = argparse.ArgumentParser(description="Monte-Carlo ensemble of LoRaSimSODAQ.py topologies")
+    for name in ARGUMENTS:
+        parser.add_argument(name, type=int)
+    parser.add_argument('--runs', type=int, default=100, help="number of topologies (default %(default)s)")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the ensemble (default %(default)s)")
+    parser.add_argument('--confidence', type=float, default=0.95, help="confidence of the intervals (default %(default)s)")
+    parser.add_argument('--target', type=float, default=None, help="relative width of the lifetime interval to stop at")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default number of cores)")
+    parser.add_argument('--json', default=None, help="file to write the results to")
+    args = parser.parse_args()
+
+    arguments = [getattr(args, name) for name in ARGUMENTS]
+    result = ensemble(arguments, args.runs, args.seed, args.confidence, args.target,
+                      args.workers, verbose=True)
+
+    print("\nTopologies:", result['runs'], "(stopped early)" if result['stoppedEarly'] else "")
+    for name in METRICS:
+        summary = result[name]
+        if summary['mean'] is None:
+            print(name + ": no results")
+            continue
+        print("{}: mean {:.4g}, mean interval [{:.4g}, {:.4g}], topologies [{:.4g}, {:.4g}]".format(
+            name, summary['mean'], summary['meanInterval'][0], summary['meanInterval'][1],
+            summary['interval'][0], summary['interval'][1]))
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(result, file, indent=2)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
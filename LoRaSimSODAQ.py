@@ -18,7 +18,18 @@ in a command prompt, while in the directory of simulation file:
 pip install -r requirements.txt
 
 USAGE:
-python3 ./LoRaSimSODAQ.py <numberOfNodes> <TXpower> <spreadingFactor> <batteryCapacity> <packetSize> <period> <setupUntilTrafficIs>
+python3 ./LoRaSimSODAQ.py <numberOfNodes> <TXpower> <spreadingFactor> <batteryCapacity> <packetSize> <period> [setupUntilTrafficIs]
+
+The simulation can also be imported and run without a plot window, matplotlib
+is then not imported:
+    from LoRaSimSODAQ import Simulation
+    sim = Simulation(100, 14, 7, 1000, 20, 10)
+    sim.setup()
+    sim.send_random(1000)
+    sim.run_until_empty()
+    print(sim.stats())
+Or on a time axis, with overlapping packets, see Simulation.run_events:
+    print(sim.run_events(days=365))
 
 ARGUMENTS:
     numberOfNodes
@@ -40,10 +51,14 @@ ARGUMENTS:
     setupUntilTrafficIs
         - A value between 0 and numberOfNodes. Sets the simulation up until
           one of the nodes' traffic is equal to this value.
-          If left 0 setup will be done just once.
+          If left 0 or left out setup will be done just once.
 
 INTERACTIVITY:
-There are 3 buttons in the simulation:
+There are 4 buttons in the simulation:
+    - Expected lifetime
+      when pressed: Calculates from the routes how many packets can be sent
+                    until the first node is empty, which node that is and
+                    how many days it lasts, without sending the packets.
     - Send untill empty
       when pressed: Packets will be assigned to random nodes and forwarded to
                     the gateway until one of the nodes is empty.
@@ -55,6 +70,8 @@ There are 3 buttons in the simulation:
 
 The nodes and gateway inside the plot can be clicked on to show some information
 about them in the console.
+Node ids are shown once you zoom in far enough that at most 300 nodes are
+in view, so large networks stay quick to draw.
 %==============================================================================%
 
 Copyright (c) 2021 S.E.C. Vergouwen
@@ -81,28 +98,121 @@ SOFTWARE.
 import random
 import math
 import sys
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-from matplotlib.widgets import Button
-import numpy as np
 import os
+import time
+import struct
+import zipfile
+import functools
+import heapq
+import itertools
+import collections
+import json
+import multiprocessing
+import numpy as np
 
-# Func: onclick(event)
-# excecutes a certain function based on where the user clicks inside the plot.
-# Params:   event
-# returns:  None
-def onclick(event):
-    if event.xdata is not None:
-        posx = round(event.xdata)
-        posy = round(event.ydata)
+# Class: Profiler()
+# Wall-clock time per phase of the simulation and counters of how often hot
+# functions run. Off by default; when off a phase or counter costs a single
+# check of enabled. Use the module-wide profiler:
+#     profiler.enabled = True
+#     ... setup, send packets ...
+#     profiler.printSummary()
+class Profiler(object):
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    # Func: reset(self)
+    # Forgets all times and counters.
+    # Params:   None
+    # Returns:  None
+    def reset(self):
+        self.seconds = {}
+        self.calls = {}
+        self.counters = {}
+
+    # Func: phase(self, name)
+    # Returns a context that adds the time spent in it to phase name.
+    # Params:   string
+    # Returns:  Phase object
+    def phase(self, name):
+        return Phase(self if self.enabled else None, name)
+
+    # Func: count(self, name, amount)
+    # Adds amount to counter name, callers check enabled first.
+    # Params:   string
+    #           integer
+    # Returns:  None
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
 
-        if posx >= GW.x - size and posx <= GW.x + size and posy >= GW.y - size and posy <= GW.y + size:
-            GW.printInfo()
-        else:
-            for node in nodes:
-                if posx >= node.x - size and posx <= node.x + size and\
-                   posy >= node.y - size and posy <= node.y + size:
-                    node.printInfo()
+    # Func: summary(self)
+    # Returns the times and counters so far.
+    # Params:   None
+    # Returns:  dict with 'phases', seconds and calls per phase, and 'counters'
+    def summary(self):
+        phases = {}
+        for name in sorted(self.seconds, key=self.seconds.get, reverse=True):
+            phases[name] = {'seconds': self.seconds[name], 'calls': self.calls[name]}
+        return {'phases': phases, 'counters': dict(sorted(self.counters.items()))}
+
+    # Func: printSummary(self)
+    # Prints the times, longest phase first, and the counters.
+    # Params:   None
+    # Returns:  None
+    def printSummary(self):
+        summary = self.summary()
+        for name, phase in summary['phases'].items():
+            print("{:<20}{:>10.3f} s{:>10} calls".format(name, phase['seconds'], phase['calls']))
+        for name, value in summary['counters'].items():
+            print("{:<20}{:>10}".format(name, value))
+
+    # Func: writeJSON(self, path)
+    # Writes the summary to a JSON file.
+    # Params:   path of the file
+    # Returns:  None
+    def writeJSON(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.summary(), file, indent=2)
+
+# Class: Phase(profiler, name)
+# Context of Profiler.phase, does nothing when profiler is None.
+class Phase(object):
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        if self.profiler is not None:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        profiler = self.profiler
+        if profiler is not None:
+            seconds = time.perf_counter() - self.start
+            profiler.seconds[self.name] = profiler.seconds.get(self.name, 0.0) + seconds
+            profiler.calls[self.name] = profiler.calls.get(self.name, 0) + 1
+        return False
+
+"""profiler of this module, see Profiler"""
+profiler = Profiler()
+
+# Func: timed(name)
+# Decorator that adds the time of every call of a function to phase name of
+# the profiler.
+# Params:   string
+# returns:  decorator
+def timed(name):
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return function(*args, **kwargs)
+            with profiler.phase(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
 
 # Func: calcRSSI(sendNode, recNode)
 # calculates RSSI value between sendNode and recNode
@@ -110,39 +220,119 @@ def onclick(event):
 #           myNode object
 # returns:  list [RSSI, distance between recNode and sendNode]
 def calcRSSI(sendNode, recNode):
+    if profiler.enabled:
+        profiler.count('calcRSSI')
+    """pairs within link range are read from the link table of the current topology"""
+    links = sendNode.sim.links
+    if links is not None:
+        link = links.lookup(sendNode.linkIndex, recNode.linkIndex)
+        if link is not None:
+            return link
+
     distToOther = sendNode.calcDistToOther(recNode)
     FSL = sendNode.calcFreeSpaceLoss(distToOther)
     atmosphericAttenuation = sendNode.atmosphericAttenuation(distToOther)
     RSSI = sendNode.TXpower - FSL - atmosphericAttenuation
     return [RSSI, distToOther]
 
-# Func: getConnection(node1, node2)
-# Makes a line2D object between the 2 positions of the nodes
-# Params:   myNode object
-#           myNode object
-# returns:  Line2D object
-def getConnection(node1, node2):
-    point1 = [node1.x, node1.y]
-    point2 = [node2.x, node2.y]
-    xVals = [point1[0], point2[0]]
-    yVals = [point1[1], point2[1]]
-    return plt.Line2D(xVals, yVals, color='r', linestyle='--', linewidth='.5')
+# Func: maxLinkDistance(TXpower, carrierFrequency, RXsensi)
+# Calculates the distance in m beyond which the RSSI of a sender is always
+# below RXsensi, using the same link budget as calcRSSI.
+# Params:   TX power in dBm
+#           carrier frequency in MHz
+#           RX sensitivity in dBm
+# returns:  distance in m
+def maxLinkDistance(TXpower, carrierFrequency, RXsensi):
+    def RSSIAt(distance):
+        FSL = 20 * math.log(distance / 1000, 10) + 20 * math.log(carrierFrequency, 10) + 32.45
+        return TXpower - FSL - distance * airAttenuation
+
+    """RSSI drops with distance, so double until below RXsensi and bisect"""
+    low = 0.001
+    high = 1.0
+    while RSSIAt(high) > RXsensi:
+        low = high
+        high *= 2
+    for i in range(64):
+        middle = (low + high) / 2
+        if RSSIAt(middle) > RXsensi:
+            low = middle
+        else:
+            high = middle
+    """small margin so rounding in the link table never drops a pair"""
+    return high * 1.000001
+
+# Func: connectionSegments(sim)
+# Returns the line of every node to its parent, for a LineCollection.
+# Params:   Simulation object
+# returns:  array (connections x 2 points x (x, y))
+def connectionSegments(sim):
+    table = sim.table
+    routes = sim.routingTable()
+    children = np.flatnonzero(routes.parent != NO_ROUTE)
+    parents = routes.parent[children]
+    toGateway = parents == TO_GATEWAY
+    parents = np.maximum(parents, 0)
+    gateways = np.maximum(routes.gateway[children], 0)
+    gatewayX = np.array([GW.x for GW in sim.gateways], dtype=float)
+    gatewayY = np.array([GW.y for GW in sim.gateways], dtype=float)
+    segments = np.empty((len(children), 2, 2))
+    segments[:, 0, 0] = table.x[children]
+    segments[:, 0, 1] = table.y[children]
+    segments[:, 1, 0] = np.where(toGateway, gatewayX[gateways], table.x[parents])
+    segments[:, 1, 1] = np.where(toGateway, gatewayY[gateways], table.y[parents])
+    return segments
+
+# Func: linkDensity(segments, bins, width, height)
+# Adds up how many metres of connection run through every cell of a raster
+# over the field, used to draw more connections than fit as lines. Every
+# connection is sampled at evenly spread points.
+# Params:   array of segments, see connectionSegments
+#           number of cells along each side
+#           width and height of the field in m
+# returns:  array (bins x bins), indexed [x cell, y cell]
+def linkDensity(segments, bins, width, height):
+    samples = 32
+    along = (np.arange(samples) + 0.5) / samples
+    density = np.zeros((bins, bins))
+    """in blocks, so the sampled points of huge networks fit in memory"""
+    for start in range(0, len(segments), 65536):
+        begin = segments[start:start + 65536, 0]
+        step = segments[start:start + 65536, 1] - begin
+        points = begin[:, None, :] + step[:, None, :] * along[None, :, None]
+        weights = np.repeat(np.hypot(step[:, 0], step[:, 1]) / samples, samples)
+        counts, edgesX, edgesY = np.histogram2d(points[:, :, 0].ravel(), points[:, :, 1].ravel(),
+                                                bins=bins, range=[[0, width], [0, height]],
+                                                weights=weights)
+        density += counts
+    return density
+
+# Func: markerArea(ax, dpi, diameter)
+# Returns the scatter marker size of a circle diameter m wide at the current
+# scale of ax.
+# Params:   Axes object
+#           dots per inch of the figure
+#           diameter in m
+# returns:  marker size in points^2
+def markerArea(ax, dpi, diameter):
+    origin, metre = ax.transData.transform([(0, 0), (1, 0)])
+    return (diameter * (metre[0] - origin[0]) * 72 / dpi) ** 2
 
 # Func: def checkSignal(recNode)
 # checks which node has best signal with receiving node
 # Params:   myNode object
 # returns:  list [node id, RSSI]
+@timed('checkSignal')
 def checkSignal(recNode):
     highestRSSI = [0, -200]
 
-    """go through all nodes
-       return highest RSSI value for recNode"""
-    for otherNode in nodes:
-        if otherNode is not recNode:
-            RSSID = calcRSSI(otherNode, recNode)
-            if RSSID[0] > highestRSSI[1] and otherNode.beacon is not None:
-                highestRSSI[0] = otherNode.id
-                highestRSSI[1] = RSSID[0]
+    """take RSSI from nodes in range of recNode, only nodes with a beacon count
+       return highest RSSI value for recNode, the link table keeps it up to
+       date while beacons are sent, see LinkTable.bestBeacon"""
+    sender, RSSI = recNode.sim.links.bestBeacon(recNode.linkIndex)
+    if sender >= 0 and RSSI > highestRSSI[1]:
+        highestRSSI[0] = int(sender)
+        highestRSSI[1] = RSSI
 
     return highestRSSI
 
@@ -157,7 +347,7 @@ def checkOutOfRange(recNode):
     if highestRSSI[0] == 0 and highestRSSI[1] == -200:
         outOfRange = True
     else:
-        bestconNode = nodes[highestRSSI[0]]
+        bestconNode = recNode.sim.nodes[highestRSSI[0]]
         dist = bestconNode.calcDistToOther(recNode)
 
         #print("highestRSSI for node", recNode.id, highestRSSI[1], "with node", bestconNode.id) ##DEBUG
@@ -165,48 +355,560 @@ def checkOutOfRange(recNode):
             outOfRange = True
     return outOfRange
 
+# Func: calcTraffic(gateways)
+# Calculates the traffic (nodes behind) of every node in one pass over the
+# routing trees, from the nodes furthest away up to the gateways, and sets the
+# overflow attribute of nodes with more traffic than maxTraffic.
+# Params:   list of myGateway objects
+# returns:  None
+@timed('calcTraffic')
+def calcTraffic(gateways):
+    """walk the trees from the gateways, parents end up before their children"""
+    order = []
+    stack = [node for GW in gateways for node in GW.children]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        stack.extend(node.children)
+
+    """so going through it backwards every child is counted before its parent"""
+    for node in reversed(order):
+        node.nodesBehind = sum(child.nodesBehind + 1 for child in node.children)
+    table = gateways[0].sim.table
+    table.overflow[:] = table.nodesBehind > maxTraffic
+
+# Class: RoutingTable(nodeList)
+# Next hop towards the gateway for every node, taken from the routing trees.
+# parent[node id] is the id of the parent node, TO_GATEWAY when the parent is
+# a gateway or NO_ROUTE when the node has no connection. gateway[node id] is
+# the index of the gateway the route ends at (see Simulation.gateways), or
+# NO_ROUTE.
+# sources holds the ids of the nodes with a route, to draw random senders
+# from. The table is made again after every change of the tree, see
+# Simulation.routingTable.
+class RoutingTable(object):
+    def __init__(self, nodeList):
+        self.nodes = nodeList
+        self.parent = [NO_ROUTE] * len(nodeList)
+        self.gateway = [NO_ROUTE] * len(nodeList)
+        for node in nodeList:
+            if isinstance(node.parent, myNode):
+                self.parent[node.id] = node.parent.id
+            elif isinstance(node.parent, myGateway):
+                self.parent[node.id] = TO_GATEWAY
+                self.gateway[node.id] = node.parent.index
+        self.parent = np.array(self.parent, dtype=np.int64)
+
+        """every node takes the gateway of the top of its path: pointers to an
+           ancestor are doubled until they all point at the top"""
+        top = np.where(self.parent >= 0, self.parent, np.arange(len(nodeList)))
+        while True:
+            higher = top[top]
+            if np.array_equal(higher, top):
+                break
+            top = higher
+        self.gateway = np.array(self.gateway, dtype=np.int64)[top]
+        """ids of the nodes with a route to the gateway"""
+        self.sources = np.flatnonzero(self.parent != NO_ROUTE)
+        """Route objects per source node and packet kind, see route()"""
+        self.routeCache = {}
+        """RouteIncidence objects per packet kind, see incidence()"""
+        self.incidenceCache = {}
+
+    # Func: path(self, node)
+    # Follows the parents from node on.
+    # Params:   myNode object
+    # Returns:  list [list of myNode objects from node on, True if it ends
+    #           at the gateway]
+    def path(self, node):
+        path = [node]
+        nextHop = self.parent[node.id]
+        while nextHop >= 0:
+            path.append(self.nodes[nextHop])
+            nextHop = self.parent[nextHop]
+        return [path, nextHop == TO_GATEWAY]
+
+    # Func: route(self, node, packet)
+    # Returns the Route of a packet like this one sent from node. It is made
+    # on first use and kept as long as this routing table is.
+    # Params:   myNode object
+    #           myPacket object
+    # Returns:  Route object
+    def route(self, node, packet):
+        key = (node.id, packet.kind())
+        route = self.routeCache.get(key)
+        if route is None:
+            path, toGateway = self.path(node)
+            route = Route(path, toGateway, packet)
+            self.routeCache[key] = route
+        return route
+
+    # Func: incidence(self, packet)
+    # Returns the RouteIncidence of all nodes with a route for packets like
+    # this one. It is made on first use and kept as long as this routing
+    # table is.
+    # Params:   myPacket object
+    # Returns:  RouteIncidence object
+    def incidence(self, packet):
+        incidence = self.incidenceCache.get(packet.kind())
+        if incidence is None:
+            incidence = RouteIncidence(self, packet)
+            self.incidenceCache[packet.kind()] = incidence
+        return incidence
+
+# Class: RouteIncidence(routingTable, packet)
+# The Routes of all nodes that have a route, as a sparse source x node matrix
+# for every Route quantity. Multiplied with the number of packets every source
+# sends it gives what all those packets add to every node.
+class RouteIncidence(object):
+    def __init__(self, routingTable, packet):
+        self.nrNodes = len(routingTable.nodes)
+        self.sources = routingTable.sources
+        routes = [routingTable.route(routingTable.nodes[i], packet) for i in self.sources]
+
+        """one entry per node on every route, routeOf tells which source it is"""
+        self.routeOf = np.repeat(np.arange(len(routes)), [len(route.path) for route in routes])
+        self.nodeIds = np.concatenate([route.nodeIds for route in routes] + [np.zeros(0, dtype=np.int64)])
+        self.quantities = {}
+        for name in ['TOA', 'TR', 'sleepTime', 'CADTime', 'energy', 'sent', 'received']:
+            self.quantities[name] = np.concatenate(
+                [getattr(route, name) for route in routes] + [np.zeros(0)])
+        self.toGateway = np.array([route.toGateway for route in routes], dtype=bool)
+        """gateway index of every route that reaches one"""
+        self.gatewayOf = np.array([route.gateway.index for route in routes if route.toGateway],
+                                  dtype=np.int64)
+        self.TOAAtGateway = packet.TOA
+
+    # Func: totals(self, counts)
+    # Calculates what sending counts[i] packets from every sources[i] adds to
+    # every node.
+    # Params:   array with a number of packets per source
+    # Returns:  dict with an array per Route quantity, indexed by node id,
+    #           the number of packets that reach a gateway and 'atGateways',
+    #           that number per gateway index (up to the last one reached)
+    def totals(self, counts):
+        weights = np.asarray(counts, dtype=float)[self.routeOf]
+        totals = {}
+        for name, values in self.quantities.items():
+            totals[name] = np.bincount(self.nodeIds, weights=weights * values,
+                                       minlength=self.nrNodes)
+        arriving = np.asarray(counts)[self.toGateway]
+        totals['atGateway'] = int(np.sum(arriving))
+        totals['atGateways'] = np.bincount(self.gatewayOf, weights=arriving).astype(np.int64)
+        return totals
+
+    # Func: perPacket(self)
+    # Calculates what one packet from a random source adds to every node on
+    # average.
+    # Params:   None
+    # Returns:  dict like totals
+    def perPacket(self):
+        return self.totals(np.full(len(self.sources), 1 / len(self.sources)))
+
+# Class: Route(path, toGateway, packet)
+# What sending a packet along path does to the nodes on it, the same as
+# sendPacket, addCADTime and addSleepTime would do hop by hop. Every array
+# has one entry per node in path: every node sends once, except the last one
+# when the path does not reach the gateway, and every node but the first one
+# receives once.
+class Route(object):
+    def __init__(self, path, toGateway, packet):
+        self.path = path
+        self.toGateway = toGateway
+        """gateway the packet arrives at, None when the path does not reach one"""
+        self.gateway = path[-1].parent if toGateway else None
+        self.nodeIds = np.array([node.id for node in path], dtype=np.int64)
+
+        self.sent = np.ones(len(path), dtype=np.int64)
+        if not toGateway:
+            self.sent[-1] = 0
+        self.received = np.ones(len(path), dtype=np.int64)
+        self.received[0] = 0
+
+        sleepTime, sleepPower = path[0].sleepCost(packet)
+        CADTime, CADPower = path[0].CADCost(packet)
+        TXcost = np.array([packet.energyCostTX(node) for node in path])
+        RXcost = packet.energyCostRX()
+
+        self.TOA = self.sent * packet.TOA
+        self.TR = self.received * packet.TOA
+        self.sleepTime = self.sent * sleepTime
+        self.CADTime = self.received * CADTime
+        self.energy = self.sent * (TXcost + sleepPower) + self.received * (RXcost + CADPower)
+        """energy used by the network up to and including each node"""
+        self.cumulativeEnergy = np.cumsum(self.energy)
+        self.TOAAtGateway = packet.TOA if toGateway else 0
+
+        self.linkBudget = None
+        senders = [node for node, sent in zip(path, self.sent) if sent]
+        if senders:
+            self.linkBudget = packet.RXsensi - senders[-1].TXpower
+
+        """hop by hop for a PacketTrace: energy of a hop is what the sender and
+           the receiving node use for it"""
+        hops = np.flatnonzero(self.sent)
+        self.hopSenders = self.nodeIds[hops]
+        lastReceiver = traceReceiver(self.gateway) if toGateway else NO_ROUTE
+        self.hopReceivers = np.append(self.nodeIds[1:], lastReceiver)[hops]
+        self.hopTOA = np.full(len(hops), packet.TOA)
+        RXenergy = np.append(self.received[1:] * (RXcost + CADPower), 0)
+        self.hopEnergy = (TXcost + sleepPower)[hops] + RXenergy[hops]
+
+
+    # Func: send(self, packet)
+    # Sends packet along the route, packet has to be in the packetList of
+    # the first node.
+    # Params:   myPacket object
+    # Returns:  None
+    def send(self, packet):
+        """a path visits every node once, so the entries can be added at once"""
+        table = self.path[0].table
+        table.totalTOA[self.nodeIds] += self.TOA
+        table.totalTR[self.nodeIds] += self.TR
+        table.totalSleepTime[self.nodeIds] += self.sleepTime
+        table.totalCADTime[self.nodeIds] += self.CADTime
+        table.energyUsed[self.nodeIds] += self.energy
+        table.battery[self.nodeIds] -= self.energy
+        table.sent[self.nodeIds] += self.sent
+        table.received[self.nodeIds] += self.received
+        if profiler.enabled:
+            profiler.count('hops', len(self.hopSenders))
+
+        self.path[0].packetList.remove(packet)
+        if self.toGateway:
+            gateway = self.gateway
+            gateway.totalTR += self.TOAAtGateway
+            gateway.received += 1
+            gateway.packetList.append(packet)
+        else:
+            self.path[-1].packetList.append(packet)
+        if self.linkBudget is not None:
+            packet.linkBudget = self.linkBudget
+
+# Class: GridIndex(x, y, cellSize)
+# Uniform grid over node coordinates. Points are bucketed in square cells,
+# so everything within cellSize of a point is found in the 3x3 cells around it.
+class GridIndex(object):
+    def __init__(self, x, y, cellSize):
+        self.cellSize = max(float(cellSize), 1.0)
+        self.originX = x.min() if len(x) else 0.0
+        self.originY = y.min() if len(y) else 0.0
+
+        cellX = ((x - self.originX) // self.cellSize).astype(np.int64)
+        cellY = ((y - self.originY) // self.cellSize).astype(np.int64)
+        self.nrCellsX = int(cellX.max()) + 1 if len(x) else 1
+        self.nrCellsY = int(cellY.max()) + 1 if len(y) else 1
+
+        """points sorted by cell, within a cell by index"""
+        cellKey = cellX * self.nrCellsY + cellY
+        self.order = np.argsort(cellKey, kind='stable')
+        self.cellStart = np.searchsorted(
+            cellKey[self.order], np.arange(self.nrCellsX * self.nrCellsY + 1))
+
+    # Func: cellOf(self, px, py)
+    # Returns the cell coordinates of a position.
+    # Params:   x, y in m
+    # Returns:  tuple (cell x, cell y)
+    def cellOf(self, px, py):
+        return (int((px - self.originX) // self.cellSize),
+                int((py - self.originY) // self.cellSize))
+
+    # Func: cellMembers(self, cellX, cellY)
+    # Returns the indices of the points in a cell, empty outside the grid.
+    # Params:   cell x, cell y
+    # Returns:  index array
+    def cellMembers(self, cellX, cellY):
+        if cellX < 0 or cellX >= self.nrCellsX or cellY < 0 or cellY >= self.nrCellsY:
+            return self.order[:0]
+        key = cellX * self.nrCellsY + cellY
+        return self.order[self.cellStart[key]:self.cellStart[key + 1]]
+
+    # Func: near(self, px, py)
+    # Returns the indices of all points in the 3x3 cells around a position,
+    # this includes every point within cellSize of it.
+    # Params:   x, y in m
+    # Returns:  sorted index array
+    def near(self, px, py):
+        cellX, cellY = self.cellOf(px, py)
+        found = [self.cellMembers(cellX + dx, cellY + dy)
+                 for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+        return np.sort(np.concatenate(found))
+
+    # Func: occupiedCells(self)
+    # Returns the cell coordinates of all cells with at least one point.
+    # Params:   None
+    # Returns:  list of tuples (cell x, cell y)
+    def occupiedCells(self):
+        keys = np.flatnonzero(np.diff(self.cellStart))
+        return [(int(key) // self.nrCellsY, int(key) % self.nrCellsY) for key in keys]
+
+# Class: LinkTable(nodeList, gatewayList, RXsensi)
+# Link budget between every node/gateway and the nodes within link range of it,
+# calculated once per topology. Only pairs that can get above RXsensi are kept,
+# found through a GridIndex with the maximum link distance as cell size.
+# Nodes are at index node.id, gateways follow after the last node. Rows are
+# stored back to back, row i holds the nodes i can send to, sorted by id.
+# With saved, the arrays of a saved topology, nothing is calculated, see
+# Simulation.load_topology.
+class LinkTable(object):
+    """arrays that make up the table, see Simulation.save_topology"""
+    arrays = ['rowStart', 'neighbours', 'RSSI', 'dist', 'senderGain', 'beaconReceived']
+
+    def __init__(self, nodeList, gatewayList, RXsensi, saved=None):
+        members = nodeList + gatewayList
+        for index, member in enumerate(members):
+            member.linkIndex = index
+        self.nrNodes = len(nodeList)
+        """strongest node with a beacon per node, made on first use, see bestBeacon"""
+        self.bestSender = None
+        if saved is not None:
+            for name in self.arrays:
+                setattr(self, name, saved['link_' + name])
+            self.maxDist = float(saved['link_maxDist'][0])
+            return
+
+        x = np.array([member.x for member in members], dtype=float)
+        y = np.array([member.y for member in members], dtype=float)
+        TXpower = np.array([member.TXpower for member in members], dtype=float)
+        carrierFrequency = np.array(
+            [member.carrierFrequency for member in members], dtype=float)
+        """part of the RSSI that only depends on the sender, see RSSIFromNodesInRange"""
+        self.senderGain = TXpower - 20 * (np.log(carrierFrequency) / math.log(10))
+
+        self.maxDist = maxLinkDistance(TXpower.max(), carrierFrequency.min(), RXsensi)
+        self.grid = GridIndex(x[:self.nrNodes], y[:self.nrNodes], self.maxDist)
+
+        """distance in m between nodes of neighbouring cells, see calcDistToOther"""
+        senders, receivers, distances = [], [], []
+        for cellX, cellY in self.grid.occupiedCells():
+            sendIndex = self.grid.cellMembers(cellX, cellY)
+            recIndex = self.grid.near(x[sendIndex[0]], y[sendIndex[0]])
+            self.addPairs(senders, receivers, distances, x, y, sendIndex, recIndex)
+        for index in range(self.nrNodes, len(members)):
+            recIndex = self.grid.near(x[index], y[index])
+            self.addPairs(senders, receivers, distances, x, y, np.array([index]), recIndex)
+
+        senders = np.concatenate(senders) if senders else np.zeros(0, dtype=np.int64)
+        order = np.argsort(senders, kind='stable')
+        self.neighbours = np.concatenate(receivers)[order] if receivers else np.zeros(0, dtype=np.int64)
+        self.dist = np.concatenate(distances)[order] if distances else np.zeros(0)
+        self.rowStart = np.zeros(len(members) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(senders, minlength=len(members)), out=self.rowStart[1:])
+
+        """RSSI = TXpower - FSL - atmospheric attenuation, see calcRSSI"""
+        sendOf = senders[order]
+        with np.errstate(divide='ignore'):
+            FSL = 20 * (np.log(self.dist / 1000) / math.log(10)) +\
+                  20 * (np.log(carrierFrequency[sendOf]) / math.log(10)) + 32.45
+        self.RSSI = TXpower[sendOf] - (FSL + self.dist * airAttenuation)
+
+        """nodes that have received a beacon, used by checkSignal"""
+        self.beaconReceived = np.zeros(self.nrNodes, dtype=bool)
+
+    # Func: addPairs(self, senders, receivers, distances, x, y, sendIndex, recIndex)
+    # Appends all pairs between sendIndex and recIndex that are within maxDist.
+    # Params:   lists to append to
+    #           coordinate arrays
+    #           index arrays
+    # Returns:  None
+    def addPairs(self, senders, receivers, distances, x, y, sendIndex, recIndex):
+        xdist = x[sendIndex][:, None] - x[recIndex][None, :]
+        ydist = y[sendIndex][:, None] - y[recIndex][None, :]
+        dist = np.sqrt(xdist * xdist + ydist * ydist)
+        inRange = (dist <= self.maxDist) & (sendIndex[:, None] != recIndex[None, :])
+        sendPos, recPos = np.nonzero(inRange)
+        senders.append(sendIndex[sendPos])
+        receivers.append(recIndex[recPos])
+        distances.append(dist[sendPos, recPos])
+
+    # Func: nodesInRange(self, index)
+    # Returns the nodes within link range of a node/gateway.
+    # Params:   link index of node/gateway
+    # Returns:  tuple (node ids, RSSI to those nodes, distances)
+    def nodesInRange(self, index):
+        row = slice(self.rowStart[index], self.rowStart[index + 1])
+        return self.neighbours[row], self.RSSI[row], self.dist[row]
+
+    # Func: RSSIFromNodesInRange(self, index)
+    # Returns the RSSI the nodes within link range reach at a node/gateway.
+    # Distance is the same both ways, so only the sender dependent part changes.
+    # Params:   link index of node/gateway
+    # Returns:  tuple (node ids, RSSI from those nodes)
+    def RSSIFromNodesInRange(self, index):
+        neighbours, RSSI, dist = self.nodesInRange(index)
+        return neighbours, RSSI + (self.senderGain[neighbours] - self.senderGain[index])
+
+    # Func: bestBeacon(self, index)
+    # Returns the node with a beacon whose signal is strongest at a node, on
+    # a tie the lowest id. Found for all nodes on first use, then kept up to
+    # date by markBeacon.
+    # Params:   link index of node
+    # Returns:  tuple (node id or -1 when no node in range has a beacon, RSSI)
+    def bestBeacon(self, index):
+        if self.bestSender is None:
+            self.findBestBeacons()
+        return self.bestSender[index], self.bestRSSI[index]
+
+    # Func: findBestBeacons(self)
+    # Finds the strongest node with a beacon of every node, like
+    # RSSIFromNodesInRange, and where every link is in the row of the other
+    # node, for markBeacon. Rows of nodes only hold nodes and link range is
+    # the same both ways, so sorting the links by receiver gives that order.
+    # Params:   None
+    # Returns:  None
+    def findBestBeacons(self):
+        nodeLinks = self.rowStart[self.nrNodes]
+        owner = np.repeat(np.arange(self.nrNodes), np.diff(self.rowStart[:self.nrNodes + 1]))
+        neighbours = self.neighbours[:nodeLinks]
+        self.reverse = np.lexsort((owner, neighbours))
+        self.bestSender = np.full(self.nrNodes, -1, dtype=np.int64)
+        self.bestRSSI = np.full(self.nrNodes, -np.inf)
+
+        heard = np.flatnonzero(self.beaconReceived[neighbours])
+        owner = owner[heard]
+        senders = neighbours[heard]
+        RSSI = self.RSSI[heard] + (self.senderGain[senders] - self.senderGain[owner])
+        """per node the best RSSI first and the lowest id first on a tie"""
+        order = np.lexsort((senders, -RSSI, owner))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = owner[order][1:] != owner[order][:-1]
+        best = order[first]
+        self.bestSender[owner[best]] = senders[best]
+        self.bestRSSI[owner[best]] = RSSI[best]
+
+    # Func: markBeacon(self, index)
+    # Marks that a node received a beacon and updates the strongest node with
+    # a beacon of the nodes in its row.
+    # Params:   node id
+    # Returns:  None
+    def markBeacon(self, index):
+        self.beaconReceived[index] = True
+        if self.bestSender is None:
+            return
+        row = slice(self.rowStart[index], self.rowStart[index + 1])
+        receivers = self.neighbours[row]
+        RSSI = self.RSSI[self.reverse[row]] + (self.senderGain[index] - self.senderGain[receivers])
+        bestRSSI = self.bestRSSI[receivers]
+        better = (RSSI > bestRSSI) | ((RSSI == bestRSSI) & (index < self.bestSender[receivers]))
+        self.bestSender[receivers[better]] = index
+        self.bestRSSI[receivers[better]] = RSSI[better]
+
+    # Func: lookup(self, sendIndex, recIndex)
+    # Looks up a single pair.
+    # Params:   link index of sending node/gateway
+    #           link index of receiving node
+    # Returns:  list [RSSI, distance] or None when not within link range
+    def lookup(self, sendIndex, recIndex):
+        start = self.rowStart[sendIndex]
+        end = self.rowStart[sendIndex + 1]
+        pos = start + np.searchsorted(self.neighbours[start:end], recIndex)
+        if pos < end and self.neighbours[pos] == recIndex:
+            return [self.RSSI[pos], self.dist[pos]]
+        return None
+
+# Class: NodeTable(nrNodes, batteryCapacity)
+# The numbers of all nodes of a simulation, one array per attribute indexed
+# by node id. myNode objects read and write their own entry, see nodeColumn,
+# and whole-network calculations use the arrays directly.
+class NodeTable(object):
+    """attributes kept per node and the type of their array"""
+    columns = [
+        # positional coördinates, transmission power & carrierFrequency
+        ('x', np.int64), ('y', np.int64),
+        ('TXpower', np.int64), ('carrierFrequency', np.int64),
+        # amount of sent/received packets
+        ('sent', np.int64), ('received', np.int64),
+        # energy variables
+        ('energyUsed', np.float64), ('battery', np.float64),
+        # mesh setup variables and traffic in the routing tree
+        ('numberOfHops', np.int64), ('nodesBehind', np.int64),
+        # time variables
+        ('totalTOA', np.float64), ('totalTR', np.float64),
+        ('totalSleepTime', np.float64), ('totalCADTime', np.float64),
+        # range/overflow variables
+        ('outOfRange', np.bool_), ('overflow', np.bool_)]
+
+    def __init__(self, nrNodes, batteryCapacity):
+        self.nrNodes = nrNodes
+        for name, dtype in self.columns:
+            setattr(self, name, np.zeros(nrNodes, dtype=dtype))
+        self.battery[:] = (batteryCapacity*V) / 1000
+
+    # Func: days(self)
+    # Returns the time every node has been running: sending, receiving,
+    # sleeping and doing CAD.
+    # Params:   None
+    # Returns:  array with days per node
+    def days(self):
+        return (((self.totalTOA + self.totalTR + self.totalSleepTime + self.totalCADTime) / 3600) / 24)
+
+# Func: nodeColumn(name)
+# Makes a myNode attribute that is kept in array name of the NodeTable, at
+# the id of the node. Values are read as plain Python numbers.
+# Params:   string
+# returns:  property
+def nodeColumn(name):
+    def get(node):
+        return getattr(node.table, name).item(node.id)
+
+    def set(node, value):
+        getattr(node.table, name)[node.id] = value
+    return property(get, set)
+
 class myNode(object):
-    def __init__(self, id, TXp, CF):
+    """only references to other objects are kept on the node itself"""
+    __slots__ = ['id', 'sim', 'table', 'linkIndex', 'packetList',
+                 'connectionList', 'beacon', 'parent', 'children']
+
+    x = nodeColumn('x')
+    y = nodeColumn('y')
+    TXpower = nodeColumn('TXpower')
+    carrierFrequency = nodeColumn('carrierFrequency')
+    sent = nodeColumn('sent')
+    received = nodeColumn('received')
+    energyUsed = nodeColumn('energyUsed')
+    battery = nodeColumn('battery')
+    numberOfHops = nodeColumn('numberOfHops')
+    nodesBehind = nodeColumn('nodesBehind')
+    totalTOA = nodeColumn('totalTOA')
+    totalTR = nodeColumn('totalTR')
+    totalSleepTime = nodeColumn('totalSleepTime')
+    totalCADTime = nodeColumn('totalCADTime')
+    outOfRange = nodeColumn('outOfRange')
+    overflow = nodeColumn('overflow')
+
+    def __init__(self, id, TXp, CF, sim, placed=False):
         self.id = id
-        """positional coördinates"""
-        self.x = random.randint(0, width)
-        self.y = random.randint(0, height)
-        """set transmission power & carrierFrequency(gotten from arguments)"""
-        self.TXpower = TXp
-        self.carrierFrequency = CF
+        """simulation this node is part of and the table with its numbers,
+           packets, energy, time and range/overflow start at zero there and
+           the battery full"""
+        self.sim = sim
+        self.table = sim.table
+        """a loaded topology already has the numbers of the node in the
+           table, see Simulation.load_topology"""
+        if not placed:
+            """positional coördinates"""
+            self.x = sim.random.randint(0, sim.width)
+            self.y = sim.random.randint(0, sim.height)
+            """set transmission power & carrierFrequency(gotten from arguments)"""
+            self.TXpower = TXp
+            self.carrierFrequency = CF
         """lists for different objects the node has"""
         self.packetList = []
         self.connectionList = []
-        self.connectionLines = []
-        """amount of sent/received packets"""
-        self.sent = 0
-        self.received = 0
-        """energy variables"""
-        self.energyUsed = 0
-        self.battery = (batteryCapacityArg*V) / 1000
         """mesh setup variables"""
         self.beacon = None
-        self.numberOfHops = 0
-        """time variables"""
-        self.totalTOA = 0
-        self.totalTR = 0
-        self.totalSleepTime = 0
-        self.totalCADTime = 0
-        """range/overflow variables"""
-        self.outOfRange = False
-        self.overflow = False
+        """routing tree, parent is the node/gateway packets are sent to"""
+        self.parent = None
+        self.children = []
 
-        """create a matplotlib circle object to use as node graphics"""
-        if (graphics == 1):
-            self.graphic = plt.Circle(
-                (self.x, self.y), size, fill=True, color='blue')
 
     # Func: printInfo(self)
     # Prints out various node properties.
     # Params:   None
     # Returns:  None
     def printInfo(self):
-        days = ((self.totalTOA/3600)/24) + ((self.totalTR/3600)/24) + ((self.totalSleepTime/3600)/24) + ((self.totalCADTime/3600)/24)
+        days = self.days()
         print("id:", self.id)
         print("Node NoH:", self.numberOfHops)
         # print("Out of range:", self.outOfRange)
@@ -226,6 +928,14 @@ class myNode(object):
         # self.possibleConnections()                               ##DEBUG
         print()
 
+    # Func: days(self)
+    # Returns the time this node has been running: sending, receiving,
+    # sleeping and doing CAD.
+    # Params:   None
+    # Returns:  days
+    def days(self):
+        return ((self.totalTOA/3600)/24) + ((self.totalTR/3600)/24) + ((self.totalSleepTime/3600)/24) + ((self.totalCADTime/3600)/24)
+
     # Func: addPacket(self, packet)
     # Adds a packet object to the packetList of node.
     # Params:   myPacket object
@@ -245,8 +955,7 @@ class myNode(object):
             dist = np.sqrt(xdist * xdist + ydist * ydist)
             return dist
         else:
-            print("ERROR: Cannot calculate distance from self to self")
-            sys.exit(-1)
+            raise ValueError("Cannot calculate distance from self to self")
 
     # Func: sendPacket(self, recNode, packet)
     # Sends a packet from this node to receiving node. Adds energy usage
@@ -263,17 +972,21 @@ class myNode(object):
             self.totalTOA += packet.TOA
             recNode.totalTR += packet.TOA
 
-            self.battery -= packet.energyCostTX(self)
-            self.energyUsed += packet.energyCostTX(self)
-            #print("TX power:", packet.energyCostTX(self))              ##DEBUG
+            TXcost = packet.energyCostTX(self)
+            self.battery -= TXcost
+            self.energyUsed += TXcost
+            #print("TX power:", TXcost)                                 ##DEBUG
             if isinstance(recNode, myNode):
-                recNode.battery -= packet.energyCostRX()
-                recNode.energyUsed += packet.energyCostRX()
+                RXcost = packet.energyCostRX()
+                recNode.battery -= RXcost
+                recNode.energyUsed += RXcost
                 #print("RX power:", packet.energyCostRX())              ##DEBUG
 
             """keep track of how many packets are sent/received"""
             self.sent += 1
             recNode.received += 1
+            if profiler.enabled:
+                profiler.count('hops')
 
             """add packet to recNode packetlist
                then remove packet from self packetlist
@@ -281,6 +994,15 @@ class myNode(object):
             recNode.packetList.append(packet)
             self.packetList.remove(packet)
             self.addSleepTime(packet)
+
+            trace = self.sim.trace
+            if trace is not None:
+                energy = TXcost + self.sleepCost(packet)[1]
+                if isinstance(recNode, myNode):
+                    energy += RXcost
+                receiver = recNode.id if isinstance(recNode, myNode) else traceReceiver(recNode)
+                packet.traceId = trace.record(packet.traceId, [self.id], [receiver], [packet.TOA],
+                                              [energy], [self.battery])
         else:
             print("ERROR: Packet is not found at this node")
 
@@ -293,30 +1015,6 @@ class myNode(object):
         FSL = 20 * math.log(distToOther / 1000, 10) + 20 * math.log(self.carrierFrequency, 10) + 32.45
         return FSL
 
-    # Func: addConnectionLine(self, other)
-    # Adds a Line2D object to connectionLines list of this node. The Line2D
-    # object is a matplotlib object and is a line between this node and otherNode.
-    # Params:   myNode object
-    # Returns:  None
-    def addConnectionLine(self, other):
-        self.connectionLines.append(getConnection(self, other))
-
-    # Func: removeConnectionLine(self, other)
-    # Removes a Line2D object from connectionLines list of this node. Line2D
-    # object is a line between this node and other node.
-    # Params:   myNode object
-    # Returns:  None
-    def removeConnectionLine(self, other):
-        for i in other.connectionLines:
-            xdata,ydata = i.get_data()
-            # print("self",self.x, self.y)
-            # print("other",other.x, other.y)
-            if xdata[1] == self.x and ydata[1] == self.y:
-                # print("xdat",xdata)
-                # print("ydat",ydata)
-                other.connectionLines.remove(i)
-                #self.connectionLines.remove(i)
-
     # Func: addConnection(self, Node_Gateway, RSSI, dist)
     # Makes a dict with a node/gateway object, RSSI of the connection and
     # distance to the node. Dict then gets added to connectionList of this node.
@@ -346,14 +1044,9 @@ class myNode(object):
     # Params:   None
     # Returns:  myNode object list
     def possibleConnections(self):
-        poslist = []
         # print("node", self.id, "can be connected to:")                ##DEBUG
-        for otherNode in nodes:
-            if otherNode is not self:
-                RSSID = calcRSSI(self, otherNode)
-                if RSSID[0] > self.beacon.RXsensi:
-                    # print("node", otherNode.id, "RSSI:", RSSID[0])    ##DEBUG
-                    poslist.append(otherNode)
+        neighbours, RSSIFromSelf, dist = self.sim.links.nodesInRange(self.linkIndex)
+        poslist = [self.sim.nodes[i] for i in neighbours[RSSIFromSelf > self.beacon.RXsensi]]
         return poslist
 
     # Func: isInConnections(self, node)
@@ -370,64 +1063,82 @@ class myNode(object):
         return result
 
     # Func: traffic(self)
-    # Calculates the amount of traffic (how many nodes to forward packets for)
-    # this node has and returns the value. If amount is higher than 4 set the
-    # overflow attribute of this node to true for later graphics.
+    # Returns the amount of traffic (how many nodes to forward packets for)
+    # this node has. The amount is kept up to date by calcTraffic and
+    # setParent, as is the overflow attribute (amount higher than maxTraffic).
     # Params:   None
     # Returns:  integer
     def traffic(self):
-        amount = 0
-        for otherNode in nodes:
-            if otherNode is not self:
-                if self.isInConnections(otherNode):
-                    if self.numberOfHops < otherNode.numberOfHops:
-                        if len(otherNode.connectionList) > 1:
-                            amount = otherNode.traffic()
-                            amount = amount + 1
-                        else:
-                            amount = amount + 1
-
-        if amount > maxTraffic:
-            self.overflow = True
-        return amount
+        if profiler.enabled:
+            profiler.count('traffic')
+        return self.nodesBehind
+
+    # Func: addTraffic(self, amount)
+    # Adds amount to the traffic of this node and all nodes between this node
+    # and the gateway, and updates their overflow attribute.
+    # Params:   integer
+    # Returns:  None
+    def addTraffic(self, amount):
+        node = self
+        while isinstance(node, myNode):
+            node.nodesBehind += amount
+            node.overflow = node.nodesBehind > maxTraffic
+            node = node.parent
+
+    # Func: setParent(self, parent)
+    # Moves this node, together with the nodes behind it, to parent in the
+    # routing tree. Traffic of the old and new path to the gateway is updated.
+    # Params:   myNode object or myGateway object
+    # Returns:  None
+    def setParent(self, parent):
+        moved = self.nodesBehind + 1
+        if self.parent is not None:
+            self.parent.children.remove(self)
+            if isinstance(self.parent, myNode):
+                self.parent.addTraffic(-moved)
+        self.parent = parent
+        parent.children.append(self)
+        if isinstance(parent, myNode):
+            parent.addTraffic(moved)
+        self.sim.topologyChanged()
 
     # Func: reroute(self)
-    # Looks at new possible connections, if it's a viable connection; remove
-    # old connection and add a new one.
+    # If the parent of this node is overflowed, looks for a better node to
+    # connect to: in range, less hops and not more traffic than this node.
+    # The one with the best RSSI becomes the new parent, the connection with
+    # the old parent is removed.
     # Params:   None
-    # Returns:  None
+    # Returns:  boolean, True if this node got a new parent
     def reroute(self):
-        for con in self.connectionList:
-            node = con.get("Node_Gateway")
-            if self.numberOfHops > node.numberOfHops and\
-               isinstance(node, myNode) and\
-               node.overflow is True:
-                # print("othernode is overflowed", node.id)              ##DEBUG
-                poscons = self.possibleConnections()
-                bestconNode = None
-                lastRSSI = -200
-                for posconNode in poscons:
-                    if posconNode is not self and\
-                       posconNode is not node and\
-                       self.numberOfHops > posconNode.numberOfHops and\
-                       posconNode.traffic() <= self.traffic():
-                        temp = calcRSSI(self, posconNode)
-                        if lastRSSI < temp[0]:
-                            lastRSSI = temp[0]
-                            bestconNode = posconNode
-
-                if bestconNode is not None:
-                    # print("New connection:", posconNode.id)            ##DEBUG
-                    self.removeConnection(node)
-                    node.removeConnection(self)
-
-                    self.removeConnectionLine(node)
-                    node.removeConnectionLine(self)
-
-                    self.addConnection(bestconNode, temp[0], temp[1])
-                    bestconNode.addConnection(self, temp[0], temp[1])
-                    self.addConnectionLine(bestconNode)
-                    print("Reroute node", self.id, "!!")
+        node = self.parent
+        if not isinstance(node, myNode) or not node.overflow:
+            return False
+        # print("othernode is overflowed", node.id)                      ##DEBUG
+
+        """possible connections from the link table, see possibleConnections"""
+        table = self.table
+        neighbours, RSSIFromSelf, dist = self.sim.links.nodesInRange(self.linkIndex)
+        viable = (RSSIFromSelf > self.beacon.RXsensi) &\
+                 (neighbours != self.id) & (neighbours != node.id) &\
+                 (table.numberOfHops[neighbours] < self.numberOfHops) &\
+                 (table.nodesBehind[neighbours] <= self.nodesBehind)
+        if not viable.any():
+            return False
+        best = np.flatnonzero(viable)[np.argmax(RSSIFromSelf[viable])]
+        bestconNode = self.sim.nodes[neighbours[best]]
+
+        # print("New connection:", bestconNode.id)                       ##DEBUG
+        self.removeConnection(node)
+        node.removeConnection(self)
+
+        self.addConnection(bestconNode, RSSIFromSelf[best], dist[best])
+        bestconNode.addConnection(self, RSSIFromSelf[best], dist[best])
+        self.setParent(bestconNode)
+        if self.sim.verbose:
+            print("Reroute node", self.id, "!!")
+        if profiler.enabled:
+            profiler.count('reroutes')
+        return True
 
     # Func: atmosphericAttenuation(self, distance)
     # Calculate the atmospheric attenuation in dB based on distance in m.
@@ -450,62 +1161,60 @@ class myNode(object):
         return distance * airAttenuation
         #print("RSSI after atmos atten:", self.RXsensi, "dist", distance) ## DEBUG
 
+    # Func: sleepCost(self, packet)
+    # Returns sleep time based on the 1% duty cycle or on the period of the
+    # simulation and the energy used while sleeping, see RadioConfig.
+    # Params:   myPacket object
+    # Returns:  list [sleep time in s, energy]
+    def sleepCost(self, packet):
+        return packet.config.sleepCost(self.sim.period)
+
     # Func: addSleepTime(self, packet)
     # Adds sleep time based on the 1% duty cycle or on a set period.
     # Params:   myPacket object
     # Returns:  None
     def addSleepTime(self, packet):
-        """
-        Send every ... minutes. Can make the lifetime
-        of the nodes significantly higher.
-        """
-        if periodArg != 0:
-            minutes = periodArg
-            sleepTime = minutes * 60
-        """
-        send as many times as you can, keeping in mind the 0,01
-        duty cycle for lora, but not the maximum uplink time for
-        LoRaWAN TTN (30 seconds per day).
-        source:
-        https://www.thethingsnetwork.org/forum/t/limitations-data-rate-packet-size-30-seconds-uplink-and-10-messages-downlink-per-day-fair-access-policy-guidelines/1300
-        """
-        if periodArg == 0:
-            sleepTime = (packet.TOA / 0.01) - packet.TOA
-        sleepPower = ((sleepModeCurrent * V) * sleepTime) * 0.000278
+        sleepTime, sleepPower = self.sleepCost(packet)
         self.totalSleepTime += sleepTime
         self.energyUsed += sleepPower
         self.battery -= sleepPower
 
+    # Func: CADCost(self, packet)
+    # Returns cad time of the packet and energy usage of the cadtime, see
+    # RadioConfig.
+    # Params:   myPacket object
+    # Returns:  list [cad time in s, energy]
+    def CADCost(self, packet):
+        return [packet.config.CADTime, packet.config.CADenergy]
+
     # Func: addCADTime(self, packet)
     # Adds cad time based on the packet and calculates energy usage of the cadtime.
     # Params:   myPacket object
     # Returns:  None
     def addCADTime(self, packet):
-        CADTimeRXMode = (32 / packet.BW + packet.Tsymbol)
-        CADTimeProcessingMode = (packet.SF * pow(2, packet.SF)) / (1750000)
-        CADPower = (((CADcurrent * V) * CADTimeRXMode) * 0.000278) + ((((CADcurrent/2) * V) * CADTimeProcessingMode) * 0.000278)
-        self.totalCADTime += CADTimeRXMode + CADTimeProcessingMode
+        CADTime, CADPower = self.CADCost(packet)
+        self.totalCADTime += CADTime
         self.energyUsed += CADPower
         self.battery -= CADPower
 
 class myGateway(object):
-    def __init__(self, id, CF, x, y):
+    def __init__(self, id, CF, x, y, sim, index=0):
         self.id = id
+        """simulation this gateway is part of and its place in sim.gateways"""
+        self.sim = sim
+        self.index = index
         self.x = x
         self.y = y
         self.received = 0
         self.numberOfHops = 0
         self.connectionList = []
+        self.children = []
         self.packetList = []
         self.TXpower = 14
         self.totalTOA = 0
         self.totalTR = 0
         self.carrierFrequency = CF
 
-        if (graphics == 1):
-            self.graphic = plt.Circle(
-                (self.x, self.y), size * 1.5, fill=True, color='green')
-
     # Func: printInfo(self)
     # Prints out various gateway properties.
     # Params:   None
@@ -621,18 +1330,24 @@ class myBeacon(object):
         """
         self.RXsensi = -174 + 10 * math.log(self.BW, 10) + SNRvals[self.SF - 7] + self.NF
 
-class myPacket(object):
-    def __init__(self, packetLength, spreadingFactor, codingRate, bandwidth, header, lowDataRateOpt):
-        self.PL = packetLength
-        self.SF = spreadingFactor
-        self.CR = codingRate
-        self.BW = bandwidth
+# Class: RadioConfig(SF, BW, CR, header, lowDataRateOpt, PL, TXpower)
+# Time on air, sensitivity and energy costs of a packet with these settings,
+# sent with TXpower. Get it through radioConfig, which calculates every
+# configuration once; the object is shared by all packets like it, so it is
+# never changed.
+class RadioConfig(object):
+    def __init__(self, SF, BW, CR, header, lowDataRateOpt, PL, TXpower):
+        self.key = (SF, BW, CR, header, lowDataRateOpt, PL, TXpower)
+        self.PL = PL
+        self.SF = SF
+        self.CR = CR
+        self.BW = BW
         # Standard preamble for EU 863-870 MHz ISM Band
         # (source https://lora-alliance.org/sites/default/files/2018-05/2015_-_lorawan_specification_1r0_611_1.pdf#page=34)
         self.Npreamble = 8
         self.header = header
         self.lowDataRateOpt = lowDataRateOpt
-        self.linkBudget = 0
+        self.TXpower = TXpower
         self.NF = 7
 
         # Override SF to 7 when using the 250 kHz bandwith
@@ -656,6 +1371,76 @@ class myPacket(object):
 
         self.RXsensi = -174 + 10 * math.log(self.BW, 10) + SNRvals[self.SF - 7] + self.NF
 
+        """energy of sending with TXpower and of receiving the packet"""
+        self.TXenergy = (((TX[TXpower + 2]/1000) * V) * (self.TOA)) * 0.000278
+        self.RXenergy = ((receiverModeCurrent * V) * (self.TOA)) * 0.000278
+
+        """channel activity detection before receiving the packet"""
+        CADTimeRXMode = (32 / self.BW + self.Tsymbol)
+        CADTimeProcessingMode = (self.SF * pow(2, self.SF)) / (1750000)
+        self.CADTime = CADTimeRXMode + CADTimeProcessingMode
+        self.CADenergy = (((CADcurrent * V) * CADTimeRXMode) * 0.000278) + ((((CADcurrent/2) * V) * CADTimeProcessingMode) * 0.000278)
+
+    # Func: sleepCost(self, period)
+    # Calculates sleep time after sending the packet based on the 1% duty
+    # cycle or on a set period and the energy used while sleeping.
+    # Params:   period in minutes, 0 for the duty cycle
+    # Returns:  list [sleep time in s, energy]
+    def sleepCost(self, period):
+        """
+        Send every ... minutes. Can make the lifetime
+        of the nodes significantly higher.
+        """
+        if period != 0:
+            minutes = period
+            sleepTime = minutes * 60
+        """
+        send as many times as you can, keeping in mind the 0,01
+        duty cycle for lora, but not the maximum uplink time for
+        LoRaWAN TTN (30 seconds per day).
+        source:
+        https://www.thethingsnetwork.org/forum/t/limitations-data-rate-packet-size-30-seconds-uplink-and-10-messages-downlink-per-day-fair-access-policy-guidelines/1300
+        """
+        if period == 0:
+            sleepTime = (self.TOA / 0.01) - self.TOA
+        sleepPower = ((sleepModeCurrent * V) * sleepTime) * 0.000278
+        return [sleepTime, sleepPower]
+
+# Func: radioConfig(SF, BW, CR, header, lowDataRateOpt, PL, TXpower)
+# Returns the RadioConfig of these settings, it is only calculated the first
+# time they are asked for.
+# Params:   SF from 7 to 12
+#           BW 125 kHz or 250 kHz
+#           CR from 1 to 4
+#           header 0 = header on, 1 = header off
+#           lowDataRateOpt 0 or 1
+#           PL packet payload in bytes
+#           TXpower from -2 to 20 dBm
+# returns:  RadioConfig object
+@functools.lru_cache(maxsize=None)
+def radioConfig(SF, BW, CR, header, lowDataRateOpt, PL, TXpower):
+    return RadioConfig(SF, BW, CR, header, lowDataRateOpt, PL, TXpower)
+
+class myPacket(object):
+    def __init__(self, packetLength, spreadingFactor, codingRate, bandwidth, header, lowDataRateOpt, TXpower=14):
+        """time on air, sensitivity and energy are shared with all packets
+           like this one, see RadioConfig"""
+        self.config = radioConfig(spreadingFactor, bandwidth, codingRate, header,
+                                  lowDataRateOpt, packetLength, TXpower)
+        self.linkBudget = 0
+        """number of the packet in a PacketTrace, given at its first hop"""
+        self.traceId = None
+
+    # Func: __getattr__(self, name)
+    # Packet settings and times (PL, SF, TOA, RXsensi, ...) are read from the
+    # config of the packet.
+    # Params:   string
+    # Returns:  value of the attribute of the config
+    def __getattr__(self, name):
+        if name == 'config':
+            raise AttributeError(name)
+        return getattr(self.config, name)
+
     # Func: printInfo(self)
     # Prints out various packet properties.
     # Params:   None
@@ -671,95 +1456,1371 @@ class myPacket(object):
               self.bitRate, "DR", DR.index(self.bitRate))
         print("Nr of symbols packet (bytes):", self.Npayload)
 
+    # Func: kind(self)
+    # Returns the settings that decide time on air and energy use of this
+    # packet, packets of the same kind cost the same.
+    # Params:   None
+    # Returns:  tuple
+    def kind(self):
+        return (self.PL, self.SF, self.CR, self.BW, self.header, self.lowDataRateOpt)
+
     # Func: energyCostTX(self, node)
     # Calculates TX power consumption based on TX power of node and time on air
     # of packet.
     # Params:   myNode object
     # Returns:  integer
     def energyCostTX(self, node):
-        totalTXpower = (((TX[node.TXpower + 2]/1000) * V) * (self.TOA)) * 0.000278
-        return totalTXpower
+        config = self.config
+        if node.TXpower != config.TXpower:
+            key = config.key
+            config = radioConfig(*key[:-1], node.TXpower)
+        return config.TXenergy
 
     # Func: energyCostRX(self)
     # Calculates TX power consumption based on time on air of packet.
     # Params:   None
     # Returns:  integer
     def energyCostRX(self):
-        totalRXpower = ((receiverModeCurrent * V) * (self.TOA)) * 0.000278
-        return totalRXpower
+        return self.config.RXenergy
+
+# Class: EventEngine(sim, packet)
+# Runs the network of a simulation on a time axis. Every node with a route
+# wakes up every period (or as often as the 1% duty cycle allows), makes a
+# packet and sends it to its parent, relays forward what they receive. Before
+# sending a node does CAD, when the channel is busy it backs off. Events are
+# kept in a heap: wake-ups, CAD and the end of transmissions, where the
+# reception is decided.
+# Receptions are lost when the receiver is sending or dead, when it is already
+# receiving, or when another transmission reaches it at less than
+# captureThreshold dB below the wanted signal during the packet. Signal
+# strengths come from the link table, the same as calcRSSI.
+# Energy and time of every node are added to the NodeTable when the run is
+# done, sleeping is the time between the activities of a node.
+# The whole state of a run can be taken out with state() and put in a new
+# engine with setState(), to continue it later, see Simulation.resume_events.
+class EventEngine(object):
+    """event kinds, ordered so at the same time transmissions end first"""
+    TXEND = 0
+    CAD = 1
+    WAKE = 2
+    """lists with an entry per node and totals of the run, see state()"""
+    nodeState = ['battery', 'dead', 'busy', 'dutyFree', 'retries', 'accounted', 'TXtime',
+                 'RXtime', 'CADtotal', 'sleepTime', 'energy', 'sent', 'received']
+    totals = ['now', 'generated', 'delivered', 'collisions', 'dropped', 'latency']
+
+    def __init__(self, sim, packet):
+        self.sim = sim
+        self.packet = packet
+        self.links = sim.links
+        routes = sim.routingTable()
+        nrNodes = len(sim.nodes)
+        """receiver of every node, gateways follow the nodes in the link
+           table, so every receiver from nrNodes on is a gateway"""
+        self.nrNodes = nrNodes
+        self.parent = [nrNodes + gateway if parent == TO_GATEWAY else int(parent)
+                       for parent, gateway in zip(routes.parent.tolist(), routes.gateway.tolist())]
+        nrMembers = nrNodes + len(sim.gateways)
+        self.sources = routes.sources.tolist()
+        """RSSI between pairs, looked up on first use"""
+        self.pairRSSI = {}
+        self.wanted = [None] * nrNodes
+        for node in self.sources:
+            self.wanted[node] = self.RSSIAt(node, self.parent[node])
+        self.RXsensi = packet.RXsensi
+
+        self.TOA = packet.TOA
+        self.TXenergy = [packet.energyCostTX(node) for node in sim.nodes]
+        self.RXenergy = packet.energyCostRX()
+        self.CADTime = packet.config.CADTime
+        self.CADenergy = packet.config.CADenergy
+        self.sleepPower = (sleepModeCurrent * V) * 0.000278
+        """time between packets of a source, see RadioConfig.sleepCost"""
+        self.interval = self.TOA + packet.config.sleepCost(sim.period)[0]
+        """a node may send again 99 times its time on air after sending"""
+        self.offTime = (self.TOA / 0.01) - self.TOA
+
+        """state per node, in lists because they are read at every event"""
+        table = sim.table
+        self.battery = table.battery.tolist()
+        self.dead = [battery <= 0 for battery in self.battery]
+        self.queue = [collections.deque() for node in range(nrNodes)]
+        self.busy = [False] * nrNodes
+        self.sending = [None] * nrMembers
+        self.receiving = [None] * nrMembers
+        self.dutyFree = [0.0] * nrNodes
+        self.retries = [0] * nrNodes
+        self.accounted = [0.0] * nrNodes
+        self.TXtime = [0.0] * nrNodes
+        self.RXtime = [0.0] * nrNodes
+        self.CADtotal = [0.0] * nrNodes
+        self.sleepTime = [0.0] * nrNodes
+        self.energy = [0.0] * nrNodes
+        self.sent = [0] * nrNodes
+        self.received = [0] * nrNodes
+
+        """transmissions in the air: [sender, receiver, wanted RSSI, lost]"""
+        self.active = {}
+        self.events = []
+        self.counter = itertools.count()
+        self.now = 0.0
+
+        self.generated = 0
+        self.delivered = 0
+        self.deliveredAt = [0] * len(sim.gateways)
+        self.collisions = 0
+        self.dropped = 0
+        self.latency = 0.0
+        self.firstDeath = None
+
+    # Func: RSSIAt(self, sender, receiver)
+    # RSSI of sender at receiver from the link table, gateways have the link
+    # indices from nrNodes on.
+    # Params:   link index of sending node
+    #           link index of receiving node/gateway
+    # Returns:  RSSI, or None when not within link range
+    def RSSIAt(self, sender, receiver):
+        key = (sender, receiver)
+        if key not in self.pairRSSI:
+            RSSID = self.links.lookup(sender, receiver)
+            if RSSID is None:
+                """rows of a gateway hold the nodes it reaches, the path
+                   loss is the same the other way around"""
+                RSSID = self.links.lookup(receiver, sender)
+                if RSSID is not None:
+                    RSSID = [RSSID[0] + self.links.senderGain[sender] - self.links.senderGain[receiver]]
+            self.pairRSSI[key] = None if RSSID is None else float(RSSID[0])
+        return self.pairRSSI[key]
+
+    # Func: schedule(self, time, kind, subject)
+    # Adds an event to the heap.
+    # Params:   time in s
+    #           event kind
+    #           node id, or transmission id for TXEND
+    # Returns:  None
+    def schedule(self, time, kind, subject):
+        heapq.heappush(self.events, (time, kind, next(self.counter), subject))
+
+    # Func: charge(self, node, start, duration, energy)
+    # Adds an activity to the energy of a node, with the sleep before it.
+    # A node whose battery runs empty dies.
+    # Params:   node id
+    #           start and duration of the activity in s
+    #           energy of the activity
+    # Returns:  None
+    def charge(self, node, start, duration, energy):
+        accounted = self.accounted
+        sleep = start - accounted[node]
+        if sleep > 0:
+            self.sleepTime[node] += sleep
+            energy += sleep * self.sleepPower
+        if start + duration > accounted[node]:
+            accounted[node] = start + duration
+        self.energy[node] += energy
+        battery = self.battery
+        battery[node] -= energy
+        if battery[node] <= 0 and not self.dead[node]:
+            self.dead[node] = True
+            """a packet in the air is counted when its transmission ends"""
+            waiting = len(self.queue[node]) - (self.sending[node] is not None)
+            self.dropped += max(waiting, 0)
+            self.queue[node].clear()
+            if self.firstDeath is None:
+                self.firstDeath = [node, start + duration]
+
+    # Func: startCAD(self, node, time)
+    # Lets node do CAD for the first packet in its queue, not before the duty
+    # cycle allows it.
+    # Params:   node id
+    #           time in s
+    # Returns:  None
+    def startCAD(self, node, time):
+        self.busy[node] = True
+        self.schedule(max(time, self.dutyFree[node]) + self.CADTime, self.CAD, node)
 
-class Index(object):
-    # Func: reset(self, event)
-    # Is called by the onClick function. Resets all data and makes new plot.
-    # Params:   event
-    # returns:  None
-    def reset(self, event):
-        print("Resetting plot...")
-        nodes.clear()
+    # Func: onWake(self, node)
+    # Node makes a packet and schedules its next wake-up.
+    # Params:   node id
+    # Returns:  None
+    def onWake(self, node):
+        if self.dead[node]:
+            return
+        self.schedule(self.now + self.interval, self.WAKE, node)
+        self.generated += 1
+        if len(self.queue[node]) >= maxQueue:
+            self.dropped += 1
+            return
+        self.queue[node].append(self.now)
+        if not self.busy[node]:
+            self.startCAD(node, self.now)
+
+    # Func: onCAD(self, node)
+    # CAD of node is done: send when no transmission is heard, otherwise back
+    # off. After maxCADRetries busy channels the packet is dropped.
+    # Params:   node id
+    # Returns:  None
+    def onCAD(self, node):
+        if self.dead[node] or not self.queue[node]:
+            self.busy[node] = False
+            return
+        self.charge(node, self.now - self.CADTime, self.CADTime, self.CADenergy)
+        self.CADtotal[node] += self.CADTime
+        if self.dead[node]:
+            self.busy[node] = False
+            return
+
+        heard = False
+        for sender, receiver, wanted, lost in self.active.values():
+            RSSI = self.RSSIAt(sender, node)
+            if RSSI is not None and RSSI > self.RXsensi:
+                heard = True
+                break
+        if heard:
+            self.retries[node] += 1
+            if self.retries[node] > maxCADRetries:
+                self.retries[node] = 0
+                self.queue[node].popleft()
+                self.dropped += 1
+                if not self.queue[node]:
+                    self.busy[node] = False
+                    return
+            backoff = self.sim.rng.uniform(1, 4) * self.TOA
+            self.schedule(self.now + backoff + self.CADTime, self.CAD, node)
+            return
+
+        self.retries[node] = 0
+        self.transmit(node)
+
+    # Func: transmit(self, node)
+    # Starts sending the first packet of node to its parent, and marks every
+    # reception this transmission disturbs. A receiver locks on the first
+    # packet that reaches it and only pays for receiving that one.
+    # Params:   node id
+    # Returns:  None
+    def transmit(self, node):
+        receiver = self.parent[node]
+        wanted = self.wanted[node]
+        transmission = [node, receiver, wanted, False]
+
+        if receiver < self.nrNodes and (self.dead[receiver] or self.sending[receiver] is not None):
+            transmission[3] = True
+        if self.receiving[receiver] is not None:
+            """receiver is locked on another packet"""
+            transmission[3] = True
+        for other in self.active.values():
+            """half duplex: a node that starts sending loses what it receives"""
+            if other[1] == node:
+                other[3] = True
+            RSSI = self.RSSIAt(node, other[1])
+            if RSSI is not None and RSSI > other[2] - captureThreshold:
+                other[3] = True
+            RSSI = self.RSSIAt(other[0], receiver)
+            if RSSI is not None and RSSI > wanted - captureThreshold:
+                transmission[3] = True
+
+        id = next(self.counter)
+        self.active[id] = transmission
+        self.sending[node] = transmission
+        self.schedule(self.now + self.TOA, self.TXEND, id)
+
+        self.charge(node, self.now, self.TOA, self.TXenergy[node])
+        self.TXtime[node] += self.TOA
+        self.sent[node] += 1
+        if self.receiving[receiver] is None:
+            """the receiver locks on this packet and only listens to it"""
+            self.receiving[receiver] = transmission
+            if receiver < self.nrNodes and not self.dead[receiver] and self.sending[receiver] is None:
+                self.charge(receiver, self.now, self.TOA, self.RXenergy)
+                self.RXtime[receiver] += self.TOA
+
+    # Func: onTXEnd(self, id)
+    # A transmission is done, the receiver gets the packet when it was not
+    # lost. The sender goes on with its queue when the duty cycle allows it.
+    # Params:   transmission id
+    # Returns:  None
+    def onTXEnd(self, id):
+        node, receiver, wanted, lost = self.active.pop(id)
+        transmission = self.sending[node]
+        self.sending[node] = None
+        if self.receiving[receiver] is transmission:
+            self.receiving[receiver] = None
+        created = self.queue[node].popleft() if self.queue[node] else self.now
+
+        if lost or (receiver < self.nrNodes and self.dead[receiver]):
+            self.collisions += 1
+        elif receiver >= self.nrNodes:
+            self.delivered += 1
+            self.deliveredAt[receiver - self.nrNodes] += 1
+            self.latency += self.now - created
+        else:
+            self.received[receiver] += 1
+            if len(self.queue[receiver]) >= maxQueue:
+                self.dropped += 1
+            else:
+                self.queue[receiver].append(created)
+                if not self.busy[receiver]:
+                    self.startCAD(receiver, self.now)
 
-        GW = myGateway("G0", 868, width / 4, height / 4)
+        self.dutyFree[node] = self.now + self.offTime
+        if self.queue[node] and not self.dead[node]:
+            self.startCAD(node, self.now)
+        else:
+            self.busy[node] = False
 
-        self.setup(True)
+    # Func: start(self)
+    # Lets every source wake up at a random moment in its first interval.
+    # Params:   None
+    # Returns:  None
+    def start(self):
+        for node in self.sources:
+            if not self.dead[node]:
+                self.schedule(self.sim.rng.uniform(0, self.interval), self.WAKE, node)
+
+    # Func: run(self, duration, untilFirstDeath, checkpoint, interval)
+    # Runs the network until duration seconds, call start() first for a new
+    # run. Between two events checkpoint is called at most every interval
+    # seconds of wall-clock time.
+    # Params:   time in s
+    #           boolean, True to stop when the first battery is empty
+    #           function called with this engine, None for no checkpoints
+    #           seconds
+    # Returns:  None
+    def run(self, duration, untilFirstDeath=False, checkpoint=None, interval=5.0):
+        events = self.events
+        handlers = {self.TXEND: self.onTXEnd, self.CAD: self.onCAD, self.WAKE: self.onWake}
+        handled = 0
+        lastCheckpoint = time.perf_counter()
+        while events and events[0][0] <= duration:
+            if untilFirstDeath and self.firstDeath is not None:
+                break
+            self.now, kind, order, subject = heapq.heappop(events)
+            handlers[kind](subject)
+            if checkpoint is not None:
+                """the clock is only read every 1024 events"""
+                handled += 1
+                if handled % 1024 == 0 and time.perf_counter() - lastCheckpoint >= interval:
+                    checkpoint(self)
+                    lastCheckpoint = time.perf_counter()
+        self.end = self.now if untilFirstDeath and self.firstDeath is not None else duration
+
+    # Func: state(self)
+    # Returns everything needed to continue this run: the lists per node, the
+    # queues, the event heap, the transmissions in the air and the totals.
+    # Params:   None
+    # Returns:  dict with an array per name
+    def state(self):
+        """read the counter without using up a number"""
+        counter = next(self.counter)
+        self.counter = itertools.count(counter)
+
+        state = {}
+        for name in self.nodeState:
+            state['engine_' + name] = np.array(getattr(self, name))
+        for name in self.totals:
+            state['engine_' + name] = np.array([getattr(self, name)])
+        state['engine_counter'] = np.array([counter], dtype=np.int64)
+        state['engine_deliveredAt'] = np.array(self.deliveredAt, dtype=np.int64)
+        state['engine_firstDeath'] = np.array(self.firstDeath or [], dtype=float)
+        state['engine_queueLength'] = np.array([len(queue) for queue in self.queue], dtype=np.int64)
+        state['engine_queue'] = np.fromiter(itertools.chain.from_iterable(self.queue), dtype=float)
+
+        """the heap list is kept in its order, so it is still a heap when read back"""
+        times, kinds, orders, subjects = zip(*self.events) if self.events else ([], [], [], [])
+        state['engine_eventTime'] = np.array(times, dtype=float)
+        state['engine_eventKind'] = np.array(kinds, dtype=np.int64)
+        state['engine_eventOrder'] = np.array(orders, dtype=np.int64)
+        state['engine_eventSubject'] = np.array(subjects, dtype=np.int64)
+
+        """transmissions by id, sending and receiving refer to them by id"""
+        numbers = list(self.active)
+        transmissions = list(self.active.values())
+        state['engine_activeId'] = np.array(numbers, dtype=np.int64)
+        for column, name in enumerate(['Sender', 'Receiver', 'Wanted', 'Lost']):
+            state['engine_active' + name] = np.array([transmission[column] for transmission in transmissions],
+                                                     dtype=[np.int64, np.int64, float, bool][column])
+        numberOf = {id(transmission): number for number, transmission in self.active.items()}
+        for name in ['sending', 'receiving']:
+            state['engine_' + name] = np.array([-1 if transmission is None else numberOf[id(transmission)]
+                                                for transmission in getattr(self, name)], dtype=np.int64)
+        return state
+
+    # Func: setState(self, state)
+    # Continues a run from a state returned by state(), the engine has to be
+    # made for the same topology and packet.
+    # Params:   dict with an array per name
+    # Returns:  None
+    def setState(self, state):
+        for name in self.nodeState:
+            setattr(self, name, state['engine_' + name].tolist())
+        for name in self.totals:
+            setattr(self, name, state['engine_' + name].item())
+        self.counter = itertools.count(int(state['engine_counter'][0]))
+        self.deliveredAt = state['engine_deliveredAt'].tolist()
+        firstDeath = state['engine_firstDeath'].tolist()
+        self.firstDeath = [int(firstDeath[0]), firstDeath[1]] if firstDeath else None
+
+        times = state['engine_queue'].tolist()
+        ends = np.cumsum(state['engine_queueLength']).tolist()
+        self.queue = [collections.deque(times[end - length:end])
+                      for end, length in zip(ends, state['engine_queueLength'].tolist())]
+
+        self.events = list(zip(state['engine_eventTime'].tolist(), state['engine_eventKind'].tolist(),
+                               state['engine_eventOrder'].tolist(), state['engine_eventSubject'].tolist()))
+
+        self.active = {}
+        for number, sender, receiver, wanted, lost in zip(
+                state['engine_activeId'].tolist(), state['engine_activeSender'].tolist(),
+                state['engine_activeReceiver'].tolist(), state['engine_activeWanted'].tolist(),
+                state['engine_activeLost'].tolist()):
+            self.active[number] = [sender, receiver, wanted, lost]
+        for name in ['sending', 'receiving']:
+            setattr(self, name, [None if number < 0 else self.active[number]
+                                 for number in state['engine_' + name].tolist()])
+
+    # Func: finish(self)
+    # Adds sleep until the end of the run and writes the totals of every node
+    # to the NodeTable and the gateways.
+    # Params:   None
+    # Returns:  dict with the results of the run
+    def finish(self):
+        for node in range(len(self.battery)):
+            if not self.dead[node]:
+                self.charge(node, self.end, 0.0, 0.0)
+        table = self.sim.table
+        table.battery[:] = self.battery
+        table.energyUsed += self.energy
+        table.totalTOA += self.TXtime
+        table.totalTR += self.RXtime
+        table.totalCADTime += self.CADtotal
+        table.totalSleepTime += self.sleepTime
+        """as int64 arrays, an empty list would be a float one"""
+        table.sent += np.asarray(self.sent, dtype=np.int64)
+        table.received += np.asarray(self.received, dtype=np.int64)
+        for GW, delivered in zip(self.sim.gateways, self.deliveredAt):
+            GW.received += delivered
+            GW.totalTR += delivered * self.TOA
+        if profiler.enabled:
+            profiler.count('hops', sum(self.sent))
+
+        return {'days': ((self.end / 3600) / 24),
+                'generated': self.generated,
+                'delivered': self.delivered,
+                'deliveredAt': {GW.id: delivered for GW, delivered in zip(self.sim.gateways, self.deliveredAt)},
+                'collisions': self.collisions,
+                'dropped': self.dropped,
+                'deliveryRatio': self.delivered / self.generated if self.generated else 0.0,
+                'meanLatency': self.latency / self.delivered if self.delivered else 0.0,
+                'firstDeath': None if self.firstDeath is None else
+                              {'node': self.firstDeath[0], 'days': (self.firstDeath[1] / 3600) / 24},
+                'events': next(self.counter)}
+
+# Class: PacketTrace(path, blockSize)
+# Hops of packets written to a binary file of fixed-width records, see dtype.
+# Records are collected in a buffer of blockSize hops that is written to the
+# file at once when it is full, so tracing costs little more than copying the
+# numbers. Read the file back with readTrace.
+class PacketTrace(object):
+    """one record per hop, receiver is negative for a gateway (see
+       traceReceiver), energy is what sender and receiver use for the hop and
+       battery what the sender has left after it"""
+    dtype = np.dtype([('packet', np.int64), ('sender', np.int32), ('receiver', np.int32),
+                      ('TOA', np.float64), ('energy', np.float64), ('battery', np.float64)])
+
+    def __init__(self, path, blockSize=65536):
+        self.file = open(path, 'wb')
+        self.buffer = np.zeros(blockSize, dtype=self.dtype)
+        self.used = 0
+        """packets given a number and hops recorded so far"""
+        self.packets = 0
+        self.hops = 0
+
+    # Func: record(self, packet, senders, receivers, TOA, energy, battery)
+    # Adds the hops of one packet.
+    # Params:   number of the packet, None for a new packet
+    #           arrays with one entry per hop
+    # Returns:  number of the packet
+    def record(self, packet, senders, receivers, TOA, energy, battery):
+        if packet is None:
+            packet = self.packets
+            self.packets += 1
+        count = len(senders)
+        done = 0
+        while done < count:
+            size = min(count - done, len(self.buffer) - self.used)
+            block = self.buffer[self.used:self.used + size]
+            block['packet'] = packet
+            block['sender'] = senders[done:done + size]
+            block['receiver'] = receivers[done:done + size]
+            block['TOA'] = TOA[done:done + size]
+            block['energy'] = energy[done:done + size]
+            block['battery'] = battery[done:done + size]
+            self.used += size
+            done += size
+            if self.used == len(self.buffer):
+                self.flush()
+        self.hops += count
+        return packet
+
+    # Func: flush(self)
+    # Writes the hops in the buffer to the file.
+    # Params:   None
+    # Returns:  None
+    def flush(self):
+        self.buffer[:self.used].tofile(self.file)
+        self.used = 0
 
-    # Func: resetUntill(self)
-    # Resets all data and makes new plot.
+    # Func: close(self)
+    # Writes the hops in the buffer and closes the file.
     # Params:   None
+    # Returns:  None
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+# Func: traceReceiver(gateway)
+# Returns the receiver a hop to gateway has in a PacketTrace: TO_GATEWAY for
+# the first gateway, one lower for every next one.
+# Params:   myGateway object
+# returns:  integer
+def traceReceiver(gateway):
+    return TO_GATEWAY - gateway.index
+
+# Func: readTrace(path, mmap)
+# Reads a file written by PacketTrace.
+# Params:   path of the file
+#           boolean, True to map the file instead of reading it
+# returns:  array of PacketTrace.dtype records
+def readTrace(path, mmap=False):
+    if mmap and os.path.getsize(path):
+        return np.memmap(path, dtype=PacketTrace.dtype, mode='r')
+    return np.fromfile(path, dtype=PacketTrace.dtype)
+
+# Func: writeArrays(path, arrays)
+# Writes arrays to an uncompressed .npz file that can be read with loadArrays.
+# They are written to a temporary file next to path first, which then takes
+# the place of path, so an interrupted write leaves the old file whole.
+# Params:   path of the file
+#           dict with an array per name
+# returns:  None
+def writeArrays(path, arrays):
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as file:
+        np.savez(file, **arrays)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+# Func: loadArrays(path, mmap)
+# Reads the arrays of an uncompressed .npz file, see Simulation.save_topology.
+# With mmap the arrays are mapped from the file instead of read, only the
+# parts that are used are then read from disk. Changes to mapped arrays stay
+# in memory, the file is never changed.
+# Params:   path of the file
+#           boolean
+# returns:  dict with an array per name
+def loadArrays(path, mmap=False):
+    if not mmap:
+        with np.load(path) as saved:
+            return {name: saved[name] for name in saved.files}
+
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as file:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError("{} is compressed, it can not be mapped".format(info.filename))
+            """the .npy data follows the local header of the member"""
+            file.seek(info.header_offset + 26)
+            nameLength, extraLength = struct.unpack('<HH', file.read(4))
+            file.seek(info.header_offset + 30 + nameLength + extraLength)
+            if np.lib.format.read_magic(file) == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(file)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(file)
+
+            name = info.filename[:-len('.npy')]
+            if int(np.prod(shape)) == 0:
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode='c', shape=shape,
+                                         order='F' if fortran else 'C',
+                                         offset=file.tell()).view(np.ndarray)
+    return arrays
+
+class Simulation(object):
+    # Func: __init__(self, nrNodes, TXpower, spreadingFactor, batteryCapacity,
+    #                packetSize, period, untilTrafficIs, verbose, seed, gateways,
+    #                field)
+    # Makes a simulation with the same arguments as the command line, see
+    # USAGE. Nothing is set up until setup() is called.
+    # With a seed the simulation draws node positions and random packets from
+    # its own random generators, so the same seed gives the same results
+    # whatever else runs in the process. Without a seed the global random and
+    # numpy.random generators are used.
+    # Only numbers are kept, matplotlib objects are made by Index.showPlot, so
+    # many simulations can run after each other in one process without a
+    # display.
+    # Params:   numberOfNodes, TXpower, spreadingFactor, batteryCapacity,
+    #           packetSize, period, setupUntilTrafficIs
+    #           boolean, True to print progress of the setup
+    #           integer or None
+    #           list of (x, y) positions in m of the gateways, None for one
+    #           gateway in the middle of the field
+    #           (width, height) of the field in m, None for width x height
     # returns:  None
-    def resetUntill(self):
-        print("Resetting plot...")
-        nodes.clear()
+    def __init__(self, nrNodes, TXpower, spreadingFactor, batteryCapacity,
+                 packetSize, period, untilTrafficIs=0, verbose=False, seed=None,
+                 gateways=None, field=None):
+        self.nrNodes = nrNodes
+        self.TXpower = TXpower
+        self.spreadingFactor = spreadingFactor
+        self.batteryCapacity = batteryCapacity
+        self.packetSize = packetSize
+        self.period = period
+        self.untilTrafficIs = untilTrafficIs
+        self.verbose = verbose
+        self.gatewayPositions = None if gateways is None else [tuple(position) for position in gateways]
+        """field the nodes are placed in and node size in the plot, in m"""
+        self.setField((width, height) if field is None else field)
+
+        self.reseed(seed)
+
+        """nodes and gateways of the current topology, made in setup, GW is
+           the first gateway"""
+        self.nodes = []
+        self.gateways = []
+        self.GW = None
+        """numbers of the nodes, see NodeTable"""
+        self.table = NodeTable(0, batteryCapacity)
+        """link table of current topology, made in setup"""
+        self.links = None
+        """routing table of current topology, see routingTable()"""
+        self.routes = None
+        """PacketTrace hops are written to, see start_trace"""
+        self.trace = None
+
+    # Func: rebalance(self)
+    # Reroutes nodes away from overflowed parents, see myNode.reroute. Only
+    # children of overflowed nodes can move, so only they are visited, from a
+    # worklist with the lowest id first. A node that moves adds traffic to its
+    # new path; children of nodes there that overflow are added to the
+    # worklist. This is repeated until nothing moves. Every node moves at most
+    # once, so it always ends.
+    # Params:   None
+    # returns:  None
+    @timed('rebalance')
+    def rebalance(self):
+        worklist = []
+        queued = np.zeros(self.nrNodes, dtype=bool)
+        moved = np.zeros(self.nrNodes, dtype=bool)
+
+        def addChildren(relay):
+            for child in relay.children:
+                if not queued[child.id] and not moved[child.id]:
+                    queued[child.id] = True
+                    heapq.heappush(worklist, child.id)
+
+        changed = True
+        while changed:
+            changed = False
+            for i in np.flatnonzero(self.table.overflow):
+                addChildren(self.nodes[i])
+            while worklist:
+                node = self.nodes[heapq.heappop(worklist)]
+                queued[node.id] = False
+                if node.reroute():
+                    changed = True
+                    moved[node.id] = True
+                    relay = node.parent
+                    while isinstance(relay, myNode):
+                        if relay.overflow:
+                            addChildren(relay)
+                        relay = relay.parent
+
+    # Func: setField(self, field)
+    # Sets the size of the field, nodes are drawn size m wide in a field of
+    # the default width and in proportion in others.
+    # Params:   (width, height) in m
+    # returns:  None
+    def setField(self, field):
+        self.width, self.height = field
+        self.size = self.width * size / width
 
-        GW = myGateway("G0", 868, width / 4, height / 4)
+    # Func: reseed(self, seed)
+    # Sets the random generators, for node positions and for packets.
+    # Params:   integer, or None for the global random and numpy.random
+    # returns:  None
+    def reseed(self, seed):
+        self.seed = seed
+        if seed is None:
+            self.random = random
+            self.rng = np.random
+        else:
+            self.random = random.Random(seed)
+            self.rng = np.random.RandomState(np.random.SeedSequence(seed).generate_state(4))
+
+    # Func: randomState(self, unseeded)
+    # Returns the state of the random generators of a seeded simulation.
+    # Params:   boolean, True to also return the state of the global random
+    #           and numpy.random generators without a seed
+    # returns:  dict with arrays, empty without a seed unless unseeded
+    def randomState(self, unseeded=False):
+        if self.seed is None and not unseeded:
+            return {}
+        version, keys, gauss = self.random.getstate()
+        name, rngKeys, position, hasGauss, cachedGauss = self.rng.get_state()
+        return {'randomKeys': np.array(keys, dtype=np.int64),
+                'randomGauss': np.array([] if gauss is None else [gauss]),
+                'rngKeys': np.array(rngKeys, dtype=np.uint32),
+                'rngPosition': np.array([position, hasGauss]),
+                'rngGauss': np.array([cachedGauss])}
+
+    # Func: setRandomState(self, state)
+    # Puts the random generators back in a state from randomState.
+    # Params:   dict with arrays
+    # returns:  None
+    def setRandomState(self, state):
+        if 'randomKeys' not in state:
+            return
+        gauss = state['randomGauss'].tolist()
+        self.random.setstate((3, tuple(state['randomKeys'].tolist()), gauss[0] if gauss else None))
+        position, hasGauss = state['rngPosition'].tolist()
+        self.rng.set_state(('MT19937', np.array(state['rngKeys']), position, hasGauss,
+                            float(state['rngGauss'][0])))
+
+    # Func: save_topology(self, path)
+    # Writes the current topology to an uncompressed .npz file: the arguments
+    # and seed, the numbers of every node (see NodeTable), the routing trees
+    # with the RSSI of every connection, the link table, the gateways and the
+    # state of the random generators. load_topology reads it back without
+    # setting up. The file is replaced at once, see writeArrays.
+    # Params:   path of the file
+    # returns:  None
+    def save_topology(self, path):
+        parentRSSI = np.full(self.nrNodes, np.nan)
+        parentDist = np.full(self.nrNodes, np.nan)
+        for node in self.nodes:
+            for connection in node.connectionList:
+                if connection['Node_Gateway'] is node.parent:
+                    parentRSSI[node.id] = connection['RSSI']
+                    parentDist[node.id] = connection['dist']
+
+        saved = {'arguments': np.array([self.nrNodes, self.TXpower, self.spreadingFactor,
+                                        self.batteryCapacity, self.packetSize, self.period]),
+                 'seed': np.array([] if self.seed is None else [self.seed], dtype=np.int64),
+                 'field': np.array([self.width, self.height], dtype=float),
+                 'gateway': np.array([[GW.x, GW.y, GW.carrierFrequency, GW.received,
+                                       GW.totalTOA, GW.totalTR] for GW in self.gateways], dtype=float),
+                 'parent': self.routingTable().parent,
+                 'gatewayOf': self.routingTable().gateway,
+                 'parentRSSI': parentRSSI,
+                 'parentDist': parentDist,
+                 'hasBeacon': np.array([node.beacon is not None for node in self.nodes], dtype=bool),
+                 'link_maxDist': np.array([self.links.maxDist])}
+        for name, dtype in NodeTable.columns:
+            saved[name] = getattr(self.table, name)
+        for name in LinkTable.arrays:
+            saved['link_' + name] = getattr(self.links, name)
+        saved.update(self.randomState())
+        writeArrays(path, saved)
+
+    # Func: load_topology(self, path, mmap)
+    # Replaces the topology by one written by save_topology, nothing is set
+    # up. The arguments and seed of the simulation are changed to the saved
+    # ones, random packets continue where they were when it was saved.
+    # With mmap the arrays are mapped from the file, see loadArrays, so large
+    # topologies are only read as far as they are used.
+    # Params:   path of the file
+    #           boolean
+    # returns:  None
+    def load_topology(self, path, mmap=False):
+        saved = loadArrays(path, mmap)
+        (self.nrNodes, self.TXpower, self.spreadingFactor, self.batteryCapacity,
+         self.packetSize, self.period) = saved['arguments'].tolist()
+        """files of before the field was saved have the default one"""
+        self.setField(saved['field'].tolist() if 'field' in saved else (width, height))
+        self.reseed(int(saved['seed'][0]) if len(saved['seed']) else None)
+        self.setRandomState(saved)
+
+        """one row per gateway, files of a single gateway have just the one"""
+        self.gateways = []
+        for index, (x, y, CF, received, totalTOA, totalTR) in enumerate(np.atleast_2d(saved['gateway']).tolist()):
+            GW = myGateway("G{}".format(index), int(CF), x, y, self, index)
+            GW.received = int(received)
+            GW.totalTOA = totalTOA
+            GW.totalTR = totalTR
+            GW.addBeacon()
+            self.gateways.append(GW)
+        self.GW = self.gateways[0]
+        self.gatewayPositions = [(GW.x, GW.y) for GW in self.gateways]
+
+        self.table = NodeTable(0, self.batteryCapacity)
+        self.table.nrNodes = self.nrNodes
+        for name, dtype in NodeTable.columns:
+            setattr(self.table, name, saved[name])
+        self.nodes = [myNode(i, self.TXpower, 868, self, placed=True) for i in range(self.nrNodes)]
+        self.links = LinkTable(self.nodes, self.gateways, self.GW.beacon.RXsensi, saved)
+
+        """routing trees, every connection is between a node and its parent"""
+        hasBeacon = saved['hasBeacon'].tolist()
+        parentRSSI = saved['parentRSSI'].tolist()
+        parentDist = saved['parentDist'].tolist()
+        gatewayOf = saved['gatewayOf'].tolist() if 'gatewayOf' in saved else [0] * self.nrNodes
+        for node, parent in zip(self.nodes, saved['parent'].tolist()):
+            if hasBeacon[node.id]:
+                node.beacon = self.GW.beacon
+            if parent == NO_ROUTE:
+                continue
+            parent = self.gateways[gatewayOf[node.id]] if parent == TO_GATEWAY else self.nodes[parent]
+            node.parent = parent
+            parent.children.append(node)
+            RSSI, dist = parentRSSI[node.id], parentDist[node.id]
+            node.connectionList.append({'Node_Gateway': parent, 'RSSI': RSSI, 'dist': dist})
+            parent.connectionList.append({'Node_Gateway': node, 'RSSI': RSSI, 'dist': dist})
+        for member in self.nodes + self.gateways:
+            member.connectionList.sort(key=lambda i: i['RSSI'], reverse=True)
+        self.topologyChanged()
+
+    # Func: makeGateways(self, positions)
+    # Replaces the gateways by new ones with a beacon, G0 at the first
+    # position, G1 at the next and so on.
+    # Params:   list of (x, y) positions in m
+    # returns:  None
+    def makeGateways(self, positions):
+        self.gateways = []
+        for index, (x, y) in enumerate(positions):
+            GW = myGateway("G{}".format(index), 868, x, y, self, index)
+            GW.addBeacon()
+            self.gateways.append(GW)
+        self.GW = self.gateways[0]
+
+    # Func: checkUntilTrafficIs(self, untilTrafficIs)
+    # Raises ValueError when no topology can have a node with untilTrafficIs
+    # nodes behind it, a node can have at most all other nodes behind it.
+    # Params:   most traffic of a node to look for
+    # returns:  None
+    def checkUntilTrafficIs(self, untilTrafficIs):
+        if untilTrafficIs < 0 or untilTrafficIs >= max(self.nrNodes, 1):
+            raise ValueError("traffic {} can not be reached with {} nodes".format(
+                untilTrafficIs, self.nrNodes))
+
+    # Func: setup(self, untilTrafficIs)
+    # Places new nodes and new gateways, sends the beacons and reroutes
+    # overflowed nodes. With untilTrafficIs set this is done again until
+    # the most traffic of a node is equal to it, see search() to look for
+    # such a topology in parallel.
+    # Raises ValueError when untilTrafficIs can not be reached and
+    # RuntimeError when it is not reached in setupTries topologies.
+    # Params:   most traffic of a node to set up until, None for the
+    #           untilTrafficIs of the simulation
+    # returns:  None
+    @timed('setup')
+    def setup(self, untilTrafficIs=None):
+        if untilTrafficIs is None:
+            untilTrafficIs = self.untilTrafficIs
+        self.checkUntilTrafficIs(untilTrafficIs)
+        for attempt in itertools.count(1):
+            """add new nodes to nodes list"""
+            self.makeGateways(self.gatewayPositions or [(self.width / 2, self.height / 2)])
+            self.table = NodeTable(self.nrNodes, self.batteryCapacity)
+            self.nodes = []
+            with profiler.phase('placeNodes'):
+                for i in range(0, self.nrNodes):
+                    node = myNode(i, self.TXpower, 868, self)
+                    self.nodes.append(node)
+
+            """calculate link budget of all node/gateway pairs in range for this topology,
+               up to the most sensitive receiver in use, the beacon or the packets"""
+            packet = self.getPacket(self.spreadingFactor, 1, BW[0], 0, self.packetSize)
+            with profiler.phase('linkTable'):
+                self.links = LinkTable(self.nodes, self.gateways,
+                                       min(self.GW.beacon.RXsensi, packet.RXsensi))
+            self.topologyChanged()
+
+            """send beacon to nodes"""
+            if not self.beaconFromGateways():
+                raise RuntimeError("a gateway has no beacon to send")
+            if self.verbose:
+                print("Succesfully sent beacon")
+            self.beaconFromNodes()
 
-        self.setup(True)
+            calcTraffic(self.gateways)
+            self.rebalance()
+
+            mostTraffic = int(self.table.nodesBehind.max(initial=0))
+            if untilTrafficIs == 0 or mostTraffic == untilTrafficIs:
+                break
+            if attempt >= setupTries:
+                raise RuntimeError("no topology with traffic {} in {} tries, see search()".format(
+                    untilTrafficIs, setupTries))
+            if self.verbose:
+                print("Resetting plot...")
+
+    # Func: search(self, timeBudget, workers, keep, tries)
+    # Looks for a topology where the most traffic of a node is untilTrafficIs
+    # by setting up topologies with different seeds in worker processes, see
+    # topologyTraffic. Stops at the first match, when timeBudget is over or
+    # after tries topologies. The simulation is then seeded so
+    # setup(result['chosen']['maxTraffic']) builds the match, or the
+    # candidate closest to untilTrafficIs when there is none. untilTrafficIs
+    # itself is not changed.
+    # Params:   seconds, None for no time limit
+    #           number of worker processes, None for the number of cores
+    #           number of candidates to return
+    #           most topologies to try, None for no limit
+    # returns:  dict with 'match' (seed or None), 'tried', 'chosen' (dict
+    #           with 'seed' and 'maxTraffic' or None when nothing was tried)
+    #           and 'candidates', list of such dicts, closest first
+    @timed('search')
+    def search(self, timeBudget=60, workers=None, keep=5, tries=10000):
+        self.checkUntilTrafficIs(self.untilTrafficIs)
+        if timeBudget is None and tries is None:
+            raise ValueError("search needs a time budget or a number of tries")
+        workers = workers or os.cpu_count()
+        deadline = None if timeBudget is None else time.time() + timeBudget
+        arguments = [self.nrNodes, self.TXpower, self.spreadingFactor,
+                     self.batteryCapacity, self.packetSize, self.period]
+        seeds = np.random.SeedSequence(self.random.randrange(2**32))
+
+        candidates = []
+        match = None
+        pool = multiprocessing.Pool(workers)
+        try:
+            while match is None and (deadline is None or time.time() < deadline) and\
+                    (tries is None or len(candidates) < tries):
+                batch = [(arguments, int(child.generate_state(1)[0]), self.gatewayPositions,
+                          (self.width, self.height)) for child in seeds.spawn(2 * workers)]
+                """in seed order, so without time budget the match is always the same"""
+                for seed, traffic in pool.imap(topologyTraffic, batch):
+                    candidates.append((abs(traffic - self.untilTrafficIs), len(candidates), seed, traffic))
+                    if traffic == self.untilTrafficIs:
+                        match = seed
+                        break
+                    if deadline is not None and time.time() >= deadline:
+                        break
+                    if tries is not None and len(candidates) >= tries:
+                        break
+        finally:
+            pool.terminate()
+            pool.join()
+
+        candidates.sort()
+        candidates = [{'seed': seed, 'maxTraffic': traffic} for distance, order, seed, traffic in candidates]
+        chosen = candidates[0] if candidates else None
+        if chosen is not None:
+            self.reseed(chosen['seed'])
+            if self.verbose:
+                print("Tried", len(candidates), "topologies, most traffic is", chosen['maxTraffic'])
+        return {'match': match,
+                'tried': len(candidates),
+                'chosen': chosen,
+                'candidates': candidates[:keep]}
+
+    # Func: send_random(self, amount)
+    # Sends amount packets from random nodes to the gateway, see
+    # sendRandomPackets.
+    # Params:   integer
+    # returns:  None
+    def send_random(self, amount=1):
+        self.sendRandomPackets(amount)
 
-    # Func: randomPacketTillBattEmpty(self, event)
-    # Checks if any of the nodes are out of battery, if not send another random
-    # packet.
-    # Params:   event
+    # Func: run_until_empty(self)
+    # Sends packets from random nodes until the battery of one of the nodes
+    # is empty.
+    # Params:   None
+    # returns:  dict with the 'node' that ran empty, the 'packets' sent and
+    #           the 'days' that node lasted, None when no node has a route
+    @timed('run_until_empty')
+    def run_until_empty(self):
+        packet = self.getPacket(self.spreadingFactor, 1, BW[0], 0, self.packetSize)
+        incidence = self.routingTable().incidence(packet)
+        if not len(incidence.sources):
+            return None
+
+        counts, emptyNode = self.drawUntilEmpty(incidence, self.table.battery)
+        self.applyPackets(incidence, counts)
+        return {'node': emptyNode,
+                'packets': int(np.sum(counts)),
+                'days': float(self.nodes[emptyNode].days())}
+
+    # Func: run_events(self, days, untilFirstDeath, checkpoint, interval)
+    # Runs the network on a time axis, every node with a route sends a packet
+    # every period and relays the packets of its children, see EventEngine.
+    # Unlike send_random, packets can be lost when transmissions overlap.
+    # With checkpoint the topology is written to checkpoint/topology.npz at
+    # the start and the state of the run to checkpoint/events.npz every
+    # interval seconds, so an interrupted run can be continued with
+    # resume_events.
+    # Params:   simulated time in days
+    #           boolean, True to stop when the first battery is empty
+    #           directory for the checkpoint, None for no checkpoints
+    #           seconds of wall-clock time between checkpoints
+    # returns:  dict with the 'days' simulated, packets 'generated',
+    #           'delivered' at the gateways ('deliveredAt' per gateway id),
+    #           lost in 'collisions' and
+    #           'dropped' from full queues or busy channels, 'deliveryRatio',
+    #           'meanLatency' in s, the 'firstDeath' node and days (or None)
+    #           and the number of 'events'
+    @timed('run_events')
+    def run_events(self, days=365, untilFirstDeath=False, checkpoint=None, interval=5.0):
+        packet = self.getPacket(self.spreadingFactor, 1, BW[0], 0, self.packetSize)
+        duration = days * 24 * 3600
+        write = None
+        if checkpoint is not None:
+            os.makedirs(checkpoint, exist_ok=True)
+            """a state left by an earlier run does not belong to this topology"""
+            statePath = os.path.join(checkpoint, 'events.npz')
+            if os.path.exists(statePath):
+                os.remove(statePath)
+            self.save_topology(os.path.join(checkpoint, 'topology.npz'))
+            write = self.eventCheckpoint(checkpoint, duration, untilFirstDeath, interval)
+
+        engine = EventEngine(self, packet)
+        engine.start()
+        if write is not None:
+            write(engine)
+        engine.run(duration, untilFirstDeath, write, interval)
+        if write is not None:
+            write(engine)
+        return engine.finish()
+
+    # Func: resume_events(self, checkpoint, interval)
+    # Continues a run of run_events from its checkpoint, with the topology,
+    # random generators and state of the run as they were at the last
+    # checkpoint. The arguments of the simulation are replaced, see
+    # load_topology. The results are the same as those of the run had it not
+    # been interrupted. Without a seed the global random generators are set
+    # to where they were. New checkpoints are written to the same directory.
+    # Params:   directory of the checkpoint
+    #           seconds between checkpoints, None for that of the run
+    # returns:  dict, see run_events
+    @timed('run_events')
+    def resume_events(self, checkpoint, interval=None):
+        self.load_topology(os.path.join(checkpoint, 'topology.npz'))
+        state = loadArrays(os.path.join(checkpoint, 'events.npz'))
+        duration, untilFirstDeath, savedInterval = state['run'].tolist()
+        untilFirstDeath = bool(untilFirstDeath)
+        interval = savedInterval if interval is None else interval
+        self.setRandomState(state)
+
+        packet = self.getPacket(self.spreadingFactor, 1, BW[0], 0, self.packetSize)
+        engine = EventEngine(self, packet)
+        engine.setState(state)
+        write = self.eventCheckpoint(checkpoint, duration, untilFirstDeath, interval)
+        engine.run(duration, untilFirstDeath, write, interval)
+        write(engine)
+        return engine.finish()
+
+    # Func: eventCheckpoint(self, checkpoint, duration, untilFirstDeath, interval)
+    # Makes the function that writes a checkpoint of a run of EventEngine:
+    # the state of the engine, the random generators and the arguments of the
+    # run, to checkpoint/events.npz. The nodes are not changed until the run
+    # is done, so the topology written at the start holds the rest.
+    # Params:   directory of the checkpoint
+    #           arguments of EventEngine.run
+    # returns:  function called with the engine
+    def eventCheckpoint(self, checkpoint, duration, untilFirstDeath, interval):
+        path = os.path.join(checkpoint, 'events.npz')
+        run = np.array([duration, untilFirstDeath, interval], dtype=float)
+
+        def write(engine):
+            state = engine.state()
+            state.update(self.randomState(unseeded=True))
+            state['run'] = run
+            writeArrays(path, state)
+        return write
+
+    # Func: render(self, path, maxLinks, dpi)
+    # Draws the topology to an image file without a window, like the plot of
+    # Index: connections, nodes (overflowed ones red) and the gateways. The
+    # type of image follows the extension of path (.png, .svg, .pdf). With
+    # more than maxLinks connections they are drawn as a raster of how many
+    # metres of connection run through every pixel, see linkDensity, and the
+    # nodes as an image. pyplot is not used, so worker processes can render
+    # at the same time.
+    # Params:   path of the file
+    #           most connections that are drawn as lines
+    #           dots per inch
     # returns:  None
-    def randomPacketTillBattEmpty(self, event):
-        print("\nCalculating, please wait...")
-        batteryEmpty = False
-
-        while not batteryEmpty:
-            callback.sendRandomPacket(event)
-            for node in nodes:
-                if not node.outOfRange:
-                    # print(node.battery)                                ##DEBUG
-                    if node.battery <= 0:
-                        batteryEmpty = True
-                        print("Battery of node", node.id, "is empty")
-                        node.printInfo()
-                        break
+    def render(self, path, maxLinks=100000, dpi=150):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.collections import LineCollection
+        fig = Figure(figsize=(8, 8), dpi=dpi)
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot(1, 1, 1)
+        ax.set_xlim((0, self.width))
+        ax.set_ylim((0, self.height))
+
+        segments = connectionSegments(self)
+        decimate = len(segments) > maxLinks
+        if decimate:
+            bins = int(fig.get_figwidth() * dpi)
+            density = linkDensity(segments, bins, self.width, self.height)
+            ax.imshow(np.log1p(density.T), origin='lower', extent=(0, self.width, 0, self.height),
+                      cmap='Reds', interpolation='nearest', aspect='auto')
+        else:
+            ax.add_collection(LineCollection(segments, colors='r', linestyles='--', linewidths=.5))
+
+        table = self.table
+        ax.scatter(table.x, table.y, s=max(markerArea(ax, dpi, 2 * self.size), 0.5), linewidths=0,
+                   c=np.where(table.overflow, 'red', 'blue'), rasterized=decimate)
+        ax.scatter([GW.x for GW in self.gateways], [GW.y for GW in self.gateways],
+                   s=max(markerArea(ax, dpi, 3 * self.size), 20), linewidths=0, c='green', zorder=3)
+        fig.savefig(path)
+
+    # Func: start_trace(self, path, blockSize)
+    # Writes every hop of the packets sent by sendToGW and myNode.sendPacket
+    # to a file from now on, see PacketTrace. Packets sent with send_random
+    # and run_until_empty are counted in bulk and have no hops to trace.
+    # Params:   path of the file
+    #           number of hops kept in memory before they are written
+    # returns:  PacketTrace object
+    def start_trace(self, path, blockSize=65536):
+        self.stop_trace()
+        self.trace = PacketTrace(path, blockSize)
+        return self.trace
+
+    # Func: stop_trace(self)
+    # Writes the hops still in memory and closes the trace file.
+    # Params:   None
+    # returns:  number of hops traced, None when there was no trace
+    def stop_trace(self):
+        if self.trace is None:
+            return None
+        trace = self.trace
+        self.trace = None
+        trace.close()
+        return trace.hops
+
+    # Func: stats(self)
+    # Returns the numbers of the current topology and of the packets sent,
+    # for the whole network and per gateway.
+    # Params:   None
+    # returns:  dict, with 'gateways' a dict per gateway id of the nodes
+    #           routed to it: 'connected', 'maxHops', 'meanHops',
+    #           'maxTraffic', 'overflowed' and 'packetsAtGateway'
+    def stats(self):
+        table = self.table
+        routes = self.routingTable()
+        hops = table.numberOfHops[routes.parent != NO_ROUTE]
+        gateways = {}
+        for GW in self.gateways:
+            member = routes.gateway == GW.index
+            gatewayHops = table.numberOfHops[member]
+            gateways[GW.id] = {'connected': len(gatewayHops),
+                               'maxHops': int(gatewayHops.max(initial=0)),
+                               'meanHops': float(np.mean(gatewayHops)) if len(gatewayHops) else 0.0,
+                               'maxTraffic': int(table.nodesBehind[member].max(initial=0)),
+                               'overflowed': int(np.count_nonzero(table.overflow[member])),
+                               'packetsAtGateway': GW.received}
+        return {'nodes': table.nrNodes,
+                'connected': len(hops),
+                'outOfRange': int(np.count_nonzero(table.outOfRange)),
+                'maxHops': int(hops.max(initial=0)),
+                'meanHops': float(np.mean(hops)) if len(hops) else 0.0,
+                'maxTraffic': int(table.nodesBehind.max(initial=0)),
+                'overflowed': int(np.count_nonzero(table.overflow)),
+                'packetsAtGateway': sum(GW.received for GW in self.gateways),
+                'energyUsed': float(np.sum(table.energyUsed) * 1000 / V),
+                'minBattery': float(table.battery.min(initial=np.inf) * 1000 / V) if table.nrNodes else 0.0,
+                'emptyNodes': int(np.count_nonzero(table.battery <= 0)),
+                'gateways': gateways}
+
+    # Func: routingTable(self)
+    # Returns the routing table of the current topology. It is only made again
+    # after the topology has changed.
+    # Params:   None
+    # returns:  RoutingTable object
+    def routingTable(self):
+        if self.routes is None:
+            self.routes = RoutingTable(self.nodes)
+        return self.routes
+
+    # Func: topologyChanged(self)
+    # Drops the routing table, has to be called when a node gets a new parent.
+    # Params:   None
+    # returns:  None
+    def topologyChanged(self):
+        self.routes = None
+
+    # Func: drawUntilEmpty(self, incidence, battery)
+    # Draws random senders until the first battery runs empty, without
+    # changing the nodes. Packets are drawn in batches of half the number the
+    # first node to run empty is expected to still handle. When a battery
+    # runs empty inside a batch the packets of the batch are put in random
+    # order and the packet where it happens is found by halving, batteries
+    # only go down so this is the same packet sending one at a time would
+    # stop at.
+    # Params:   RouteIncidence object
+    #           array with battery left per node
+    # returns:  list [array with number of packets per source, id of the
+    #           node that ran empty], no packets when a battery already is
+    def drawUntilEmpty(self, incidence, battery):
+        nrSources = len(incidence.sources)
+        drain = incidence.perPacket()['energy']
+        battery = battery.copy()
+        sent = np.zeros(nrSources, dtype=np.int64)
+
+        with np.errstate(divide='ignore'):
+            packetsLeft = np.where(drain > 0, battery / drain, np.inf)
+        if np.min(packetsLeft) <= 0:
+            return [sent, int(np.argmin(packetsLeft))]
+
+        while True:
+            with np.errstate(divide='ignore'):
+                packetsLeft = np.min(np.where(drain > 0, battery / drain, np.inf))
+            amount = max(1, int(packetsLeft / 2))
+            counts = self.rng.multinomial(amount, np.full(nrSources, 1 / nrSources))
+            used = incidence.totals(counts)['energy']
+            if np.all(battery - used > 0):
+                battery -= used
+                sent += counts
+                continue
+
+            """put the packets of this batch in a random order to halve it"""
+            senders = np.repeat(np.arange(nrSources), counts)
+            self.rng.shuffle(senders)
+            low = 0
+            high = amount
+            while high - low > 1:
+                middle = (low + high) // 2
+                counts = np.bincount(senders[:middle], minlength=nrSources)
+                if np.all(battery - incidence.totals(counts)['energy'] > 0):
+                    low = middle
+                else:
+                    high = middle
+            counts = np.bincount(senders[:high], minlength=nrSources)
+            emptyNode = int(np.argmax(battery - incidence.totals(counts)['energy'] <= 0))
+            return [sent + counts, emptyNode]
+
+    # Func: lifetime(self, trials, confidence)
+    # Works out how long the network lasts when random nodes keep sending
+    # packets, without sending them. Every node uses on average the energy
+    # of the routes it is on divided by the number of nodes that send, so the
+    # first node to run empty is the one with the least packets left.
+    # With trials > 0 drawUntilEmpty is run that many times to give a
+    # Monte-Carlo interval around it.
+    # Params:   number of Monte-Carlo runs, 0 for none
+    #           confidence of the interval, between 0 and 1
+    # returns:  dict with 'packets' until the first battery is empty (0 when
+    #           one already is), 'node' that runs empty and 'days' of
+    #           operation of that node, None
+    #           when no node has a route. 'gateways' holds the same per
+    #           gateway id, for the first node routed to it to run empty.
+    #           With trials also 'packetsMean', 'packetsInterval' and
+    #           'daysInterval' [low, high]
+    @timed('lifetime')
+    def lifetime(self, trials=0, confidence=0.95):
+        packet = self.getPacket(self.spreadingFactor, 1, BW[0], 0, self.packetSize)
+        incidence = self.routingTable().incidence(packet)
+        if not len(incidence.sources):
+            return None
+
+        perPacket = incidence.perPacket()
+        battery = self.table.battery
+        timeSpent = self.table.totalTOA + self.table.totalTR + self.table.totalSleepTime + self.table.totalCADTime
+        timePerPacket = perPacket['TOA'] + perPacket['TR'] + perPacket['sleepTime'] + perPacket['CADTime']
+
+        with np.errstate(divide='ignore'):
+            packetsLeft = np.where(perPacket['energy'] > 0, battery / perPacket['energy'], np.inf)
+        emptyNode = int(np.argmin(packetsLeft))
+        """the packet that empties the battery counts, none when it already is"""
+        result = {'packets': max(0, int(math.ceil(packetsLeft[emptyNode]))),
+                  'node': emptyNode}
+        result['days'] = float(((timeSpent[emptyNode] + result['packets'] * timePerPacket[emptyNode]) / 3600) / 24)
+
+        gatewayOf = self.routingTable().gateway
+        result['gateways'] = {}
+        for GW in self.gateways:
+            members = np.flatnonzero(gatewayOf == GW.index)
+            if not len(members):
+                continue
+            node = int(members[np.argmin(packetsLeft[members])])
+            packets = max(0, int(math.ceil(packetsLeft[node])))
+            result['gateways'][GW.id] = {'packets': packets, 'node': node,
+                                         'days': float(((timeSpent[node] + packets * timePerPacket[node]) / 3600) / 24)}
+
+        if trials > 0:
+            packets = np.zeros(trials)
+            days = np.zeros(trials)
+            for trial in range(trials):
+                counts, trialNode = self.drawUntilEmpty(incidence, battery)
+                totals = incidence.totals(counts)
+                packets[trial] = np.sum(counts)
+                days[trial] = ((timeSpent[trialNode] + totals['TOA'][trialNode] + totals['TR'][trialNode] +
+                                totals['sleepTime'][trialNode] + totals['CADTime'][trialNode]) / 3600) / 24
+            percentiles = [50 * (1 - confidence), 50 * (1 + confidence)]
+            result['packetsMean'] = float(np.mean(packets))
+            result['packetsInterval'] = [float(value) for value in np.percentile(packets, percentiles)]
+            result['daysInterval'] = [float(value) for value in np.percentile(days, percentiles)]
+        return result
+
+    # Func: sendRandomPackets(self, amount)
+    # Sends amount packets from random nodes to the gateway in one step. How
+    # many packets every node with a route sends is drawn at once and what
+    # they add to the nodes comes from the RouteIncidence of all routes.
+    # Statistically the same as calling sendRandomPacket amount times, but no
+    # myPacket objects are made per packet.
+    # Params:   integer
+    # returns:  None
+    def sendRandomPackets(self, amount):
+        packet = self.getPacket(self.spreadingFactor, 1, BW[0], 0, self.packetSize)
+        incidence = self.routingTable().incidence(packet)
+        if len(incidence.sources):
+            counts = self.rng.multinomial(
+                amount, np.full(len(incidence.sources), 1 / len(incidence.sources)))
+            self.applyPackets(incidence, counts)
+
+    # Func: applyPackets(self, incidence, counts)
+    # Adds what sending counts[i] packets from every incidence.sources[i] does
+    # to the nodes and the gateway.
+    # Params:   RouteIncidence object
+    #           array with a number of packets per source
+    # returns:  None
+    def applyPackets(self, incidence, counts):
+        totals = incidence.totals(counts)
+        table = self.table
+        table.totalTOA += totals['TOA']
+        table.totalTR += totals['TR']
+        table.totalSleepTime += totals['sleepTime']
+        table.totalCADTime += totals['CADTime']
+        table.energyUsed += totals['energy']
+        table.battery -= totals['energy']
+        table.sent += np.rint(totals['sent']).astype(np.int64)
+        table.received += np.rint(totals['received']).astype(np.int64)
+        for GW, arrived in zip(self.gateways, totals['atGateways'].tolist()):
+            GW.received += arrived
+            GW.totalTR += arrived * incidence.TOAAtGateway
+        if profiler.enabled:
+            profiler.count('hops', int(np.rint(np.sum(totals['sent']))))
 
     # Func: sendRandomPacket(self, event)
-    # Gets a packet, add it to a random node and send the packet from that node.
-    # Params:   event
+    # Gets a packet, add it to a random node with a route to the gateway and
+    # send the packet from that node.
+    # Params:   event, not used so it can be a button callback
     # returns:  None
-    def sendRandomPacket(self, event):
+    def sendRandomPacket(self, event=None):
         """get packet to send"""
-        packet = self.getPacket(spreadingFactorArg, 1, BW[0], 0, packetSizeArg)
-
-        """pick random node to send the packet and add the randPacket to its list"""
-        randNode = nodes[random.randint(0, len(nodes)) - 1]
+        packet = self.getPacket(self.spreadingFactor, 1, BW[0], 0, self.packetSize)
+
+        """pick random node with a route to the gateway, all with the same
+           chance, and add the randPacket to its list"""
+        sources = self.routingTable().sources
+        if not len(sources):
+            if self.verbose:
+                print("No node has a connection to the gateway")
+            return
+        randNode = self.nodes[sources[self.random.randrange(len(sources))]]
         randNode.addPacket(packet)
 
-        """send packet to a node in randNode's connection list
-           can only be done if:
-           randNode has a connection
-           the connection is to a node with less number of hops"""
-        if randNode.connectionList:
-            # print out randNode's connections                          ## DEBUG
-            # print("node", randNode.id, "nodes to send to", )
-            # for i in randNode.connectionList:
-                # print("Node:", i.get('Node_Gateway').id, "RSSI:",
-                      # i.get('RSSI'), "distance:", i.get('dist'))
-            #print("Sending packet from node {:d}...".format(randNode.id))##DEBUG
-            self.sendToGW(randNode, packet)
-        else:
-            # print("randNode", randNode.id, "has no node to send to")   ##DEBUG
-            self.sendRandomPacket(event)
+        """send packet to the gateway through randNode's parents"""
+        # print out randNode's connections                          ## DEBUG
+        # print("node", randNode.id, "nodes to send to", )
+        # for i in randNode.connectionList:
+            # print("Node:", i.get('Node_Gateway').id, "RSSI:",
+                  # i.get('RSSI'), "distance:", i.get('dist'))
+        #print("Sending packet from node {:d}...".format(randNode.id))##DEBUG
+        self.sendToGW(randNode, packet)
 
     # Func: getPacket(self, SF, CR, BW, H, PL)
     # Returns a packet with given parameters.
@@ -776,16 +2837,16 @@ class Index(object):
             lowDataRateOpt = 1
         else:
             lowDataRateOpt = 0
-        return myPacket(PL, SF, CR, BW, H, lowDataRateOpt)
+        return myPacket(PL, SF, CR, BW, H, lowDataRateOpt, self.TXpower)
 
     # Func: getPacket(self)
     # Returns a packet with random parameters.
     # Params:   None
     # returns:  myPacket object
     def getRandomPacket(self):
-        SF = random.randint(7, 12)
+        SF = self.random.randint(7, 12)
         codingRate = 1
-        bandwidth = random.choice(BW)
+        bandwidth = self.random.choice(BW)
         header = 0
 
         """turn lowDataRateOpt for SF is higher or equal to 11
@@ -808,7 +2869,7 @@ class Index(object):
         else:
             packetLength = 10
 
-        return myPacket(packetLength, SF, codingRate, bandwidth, header, lowDataRateOpt)
+        return myPacket(packetLength, SF, codingRate, bandwidth, header, lowDataRateOpt, self.TXpower)
 
     # Func: sendToGW(self, node, packet)
     # Goes through algorithm to send a packet from node, to next node in chain
@@ -817,61 +2878,62 @@ class Index(object):
     #           myPacket object
     # returns:  None
     def sendToGW(self, node, packet):
-        atGateway = False
-
-        while not atGateway:
-            for i in node.connectionList:
-                recNode = i.get('Node_Gateway')
-
-                if recNode.numberOfHops < node.numberOfHops:
-                    # print("This is the node to send to next:", recNode.id) ##DEBUG
-                    packet.linkBudget = packet.RXsensi - node.TXpower
-                    node.sendPacket(recNode, packet)
-                    #print("Battery of node:", node.battery, " ", node.id)
-
-                    if isinstance(recNode, myNode):
-                        recNode.addCADTime(packet)
-                    node = recNode
-                if isinstance(recNode, myGateway):
-                    atGateway = True
-                    # print("packet received at Gateway")                    ##DEBUG
-                    break
-
-    # Func: beaconFromGW(self, GW)
-    # Goes through algorithm to send a beacon from gateway. Nodes in range
-    # receive beacon.
-    # Params:   myGateway object
-    # returns:  None
-    def beaconFromGW(self, GW):
-        if GW.beacon is not None:
+        """time and energy of every hop is worked out once per source node,
+           see Route"""
+        route = self.routingTable().route(node, packet)
+        route.send(packet)
+        if self.trace is not None:
+            packet.traceId = self.trace.record(packet.traceId, route.hopSenders, route.hopReceivers,
+                                               route.hopTOA, route.hopEnergy,
+                                               self.table.battery[route.hopSenders])
+
+    # Func: beaconFromGateways(self)
+    # Sends the beacon of all gateways at once. Every node in range of a
+    # gateway receives the beacon of the one with the best RSSI, on a tie the
+    # first gateway.
+    # Params:   None
+    # returns:  1 when sent, 0 when a gateway has no beacon
+    @timed('beaconFromGW')
+    def beaconFromGateways(self):
+        heard = []
+        for GW in self.gateways:
+            if GW.beacon is None:
+                # print("ERROR: No beacon found in gateway:", GW.id)                            ##DEBUG
+                return 0
             # print("Sending beacon from gateway", GW.id)                    ##DEBUG
-            for i in range(len(nodes)):
-                node = nodes[i]
-                """calc RSSI according to distance between GW and node"""
-                RSSID = calcRSSI(GW, node)
-
-                if RSSID[0] > GW.beacon.RXsensi and node.beacon is None:  # node received beacon
-                    # print("Node", node.id, " received beacon, RSSI:", RSSID[0])           ##DEBUG
-
-                    """add node to list of connections of GW and other way around
-                       gateway to node"""
-                    GW.addConnection(node, RSSID[0], RSSID[1])
-                    """node to gateway"""
-                    node.addConnection(GW, RSSID[0], RSSID[1])
-
-                    """Set number of hops from GW to node"""
-                    node.numberOfHops = GW.numberOfHops + 1
-                    node.beacon = GW.beacon
-
-                    """add graphic lines from node to GW"""
-                    node.addConnectionLine(GW)
-
-                #else:  # node didnt receive beacon
-                    # print("Node", node.id," failed  to receive beacon, RSSI:", RSSID[0])  ##DEBUG
-            return 1
-        else:
-            # print("ERROR: No beacon found in gateway:", GW.id)                            ##DEBUG
-            return 0
+            """only nodes above RX sensitivity of the beacon are looked at"""
+            neighbours, RSSIFromGW, dist = self.links.nodesInRange(GW.linkIndex)
+            inRange = np.flatnonzero(RSSIFromGW > GW.beacon.RXsensi)
+            heard.append((neighbours[inRange], RSSIFromGW[inRange], dist[inRange],
+                          np.full(len(inRange), GW.index)))
+        nodeIds, RSSI, dist, gatewayOf = [np.concatenate(column) for column in zip(*heard)]
+
+        """sorted by node and best RSSI first, the first entry of a node wins"""
+        order = np.lexsort((-RSSI, nodeIds))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = nodeIds[order][1:] != nodeIds[order][:-1]
+        for i in order[first]:
+            node = self.nodes[nodeIds[i]]
+            GW = self.gateways[gatewayOf[i]]
+            """RSSI according to distance between GW and node"""
+            RSSID = [RSSI[i], dist[i]]
+
+            if node.beacon is None:  # node received beacon
+                # print("Node", node.id, " received beacon, RSSI:", RSSID[0])           ##DEBUG
+
+                """add node to list of connections of GW and other way around
+                   gateway to node"""
+                GW.addConnection(node, RSSID[0], RSSID[1])
+                """node to gateway"""
+                node.addConnection(GW, RSSID[0], RSSID[1])
+
+                """Set number of hops from GW to node"""
+                node.numberOfHops = GW.numberOfHops + 1
+                node.beacon = GW.beacon
+                node.parent = GW
+                GW.children.append(node)
+                self.links.markBeacon(node.id)
+        return 1
 
     # Func: beaconFromNode(self, sendNode)
     # Goes through algorithm to send a beacon from node. Nodes in range
@@ -882,14 +2944,17 @@ class Index(object):
         # print("Sending beacon from node", sendNode.id,
         #      "NoH:", sendNode.numberOfHops)  ##DEBUG
 
-        """go through all nodes"""
-        for recNode in nodes:
+        """go through all nodes without a beacon that are in range of sendNode"""
+        neighbours, RSSIFromSendNode, dist = self.links.nodesInRange(sendNode.linkIndex)
+        inRange = RSSIFromSendNode > sendNode.beacon.RXsensi
+        for i in np.flatnonzero(inRange & ~self.links.beaconReceived[neighbours]):
+            recNode = self.nodes[neighbours[i]]
             # print("Looking at node", recNode.id) ##DEBUG
 
             """check if node is not same as sending node and node has no beacon yet"""
             if sendNode.id is not recNode.id and recNode.beacon is None:
-                """calc RSSI according to distance between sending and receiving node"""
-                RSSID = calcRSSI(sendNode, recNode)
+                """RSSI according to distance between sending and receiving node"""
+                RSSID = [RSSIFromSendNode[i], dist[i]]
                 RSSIToRecNodeFromSendNode = RSSID[0]
 
                 if RSSIToRecNodeFromSendNode > sendNode.beacon.RXsensi:  # recNode is able to receive beacon
@@ -897,7 +2962,7 @@ class Index(object):
                         check if RSSI between other node and node to receive beacon is
                         higher than RSSI between this node and node to receive"""
                     highestRSSID = checkSignal(recNode)
-                    bestconNode = nodes[highestRSSID[0]]
+                    bestconNode = self.nodes[highestRSSID[0]]
 
                     if bestconNode.id == sendNode.id or sendNode.isInConnections(bestconNode):
                         """sendNode has best connection or is node with least hops -> send to recNode"""
@@ -913,9 +2978,6 @@ class Index(object):
                             sendNode.addConnection(
                                 recNode, RSSIToRecNodeFromSendNode, RSSID[1])
 
-                            """add graphic lines from recNode to sendnode"""
-                            sendNode.addConnectionLine(recNode)
-
                         if bestconNode not in recNode.connectionList:
                             """receiver node to sending node"""
                             recNode.addConnection(
@@ -924,6 +2986,9 @@ class Index(object):
                             """Set number of hops from recNode to sendnode"""
                             recNode.numberOfHops = sendNode.numberOfHops + 1
                             recNode.beacon = sendNode.beacon
+                            recNode.parent = sendNode
+                            sendNode.children.append(recNode)
+                            self.links.markBeacon(recNode.id)
 
                         #print("\tNode", recNode.id, "received beacon, RSSI:",
                         #      RSSIToRecNodeFromSendNode)                       ##DEBUG
@@ -940,43 +3005,178 @@ class Index(object):
     # Func: beaconFromNodes(self)
     # Goes through algorithm to send beacon from nodes, if all nodes received
     # or are out of range mesh setup is done.
-    # receive beacon.
+    # Whether a node without beacon is out of range only changes when a node
+    # in range of it receives a beacon, so after the first hop only the
+    # neighbours of the nodes that received one are checked again, taken
+    # from the rows of the link table.
     # Params:   None
     # returns:  None
+    @timed('beaconFromNodes')
     def beaconFromNodes(self):
         NoH = 1
         beaconDone = False
+        links = self.links
+        table = self.table
+        """nodes to check with checkOutOfRange, at first all without a beacon"""
+        check = np.flatnonzero(~links.beaconReceived)
 
         """go through nodes with NoH = 1, aka in connection with GW"""
         while not beaconDone:
-            for node in nodes:
-                if node.numberOfHops == NoH and node.beacon is not None:
-                    """send beacon from the nodes that received a beacon from GW or other Node"""
-                    self.beaconFromNode(node)
+            hadBeacon = links.beaconReceived.copy()
+            for i in np.flatnonzero((table.numberOfHops == NoH) & hadBeacon):
+                """send beacon from the nodes that received a beacon from GW or other Node"""
+                self.beaconFromNode(self.nodes[i])
 
             """next hop"""
             NoH += 1
 
-            nodesDone = 0
-            """check if beacon is sent to all nodes that were able to receive it"""
-            for node in nodes:
-                if node.beacon is not None:
-                    """node has a beacon and is done."""
-                    #print("node", node.id, "is done with beacon, received") #DEBUG
-                    nodesDone += 1
-                elif node.numberOfHops == 0:
-                    """check if this node can connect to a node with a beacon next hop"""
-                    node.outOfRange = checkOutOfRange(node)
-                if node.outOfRange:
-                    """node has no possibility to connect to any nodes with a beacon
-                       this means this node is done."""
-                    #print("node", node.id, "is out of range of all nodes") #DEBUG
-                    nodesDone += 1
-
-            if nodesDone == len(nodes):
+            """only nodes in range of a node with a new beacon can change"""
+            received = np.flatnonzero(links.beaconReceived & ~hadBeacon)
+            rows = [links.neighbours[links.rowStart[i]:links.rowStart[i + 1]] for i in received]
+            check = np.unique(np.concatenate([check] + rows))
+
+            """check if this node can connect to a node with a beacon next hop"""
+            for i in check[~links.beaconReceived[check]]:
+                node = self.nodes[i]
+                node.outOfRange = checkOutOfRange(node)
+            check = np.zeros(0, dtype=np.int64)
+
+            """check if beacon is sent to all nodes that were able to receive it,
+               a node is done when it has a beacon or it is out of range"""
+            nodesDone = np.count_nonzero(links.beaconReceived) + np.count_nonzero(table.outOfRange)
+            if nodesDone == len(self.nodes):
                 """all nodes either have received a beacon or are out of range."""
-                print("End of beacon")
+                if self.verbose:
+                    print("End of beacon")
                 beaconDone = True
+                self.topologyChanged()
+
+# Func: topologyTraffic(candidate)
+# Sets up the topology of a seed, without plot, and returns the most traffic
+# of a node in it. Used by the worker processes of Simulation.search.
+# Params:   tuple (list with the arguments of Simulation, seed, gateway
+#           positions or None, field)
+# returns:  tuple (seed, most traffic)
+def topologyTraffic(candidate):
+    arguments, seed, gateways, field = candidate
+    sim = Simulation(*arguments, seed=seed, gateways=gateways, field=field)
+    sim.setup()
+    return (seed, int(sim.table.nodesBehind.max(initial=0)))
+
+class Index(Simulation):
+    # Func: __init__(self, nrNodes, TXpower, spreadingFactor, batteryCapacity,
+    #                packetSize, period, untilTrafficIs, gateways, field)
+    # Simulation with the plot window, the buttons call the methods of this
+    # object.
+    # Params:   see Simulation
+    # returns:  None
+    def __init__(self, nrNodes, TXpower, spreadingFactor, batteryCapacity,
+                 packetSize, period, untilTrafficIs, gateways=None, field=None):
+        Simulation.__init__(self, nrNodes, TXpower, spreadingFactor, batteryCapacity,
+                            packetSize, period, untilTrafficIs, verbose=True, gateways=gateways,
+                            field=field)
+        import matplotlib.pyplot as plt
+
+        """plot axis variables"""
+        self.fig, self.ax = plt.subplots()
+        self.axreset = plt.axes([0.58, 0.9, 0.1, 0.075])
+        self.axrandpacket = plt.axes([0.7, 0.9, 0.2, 0.075])
+        self.axsendtillempty = plt.axes([0.36, 0.9, 0.2, 0.075])
+        self.axlifetime = plt.axes([0.14, 0.9, 0.2, 0.075])
+
+    # Func: onclick(self, event)
+    # excecutes a certain function based on where the user clicks inside the plot.
+    # Params:   event
+    # returns:  None
+    def onclick(self, event):
+        if event.inaxes is self.ax and event.xdata is not None:
+            for GW in self.gateways:
+                if abs(event.xdata - GW.x) <= self.size and abs(event.ydata - GW.y) <= self.size:
+                    GW.printInfo()
+                    return
+            node = self.nearestNode(event.xdata, event.ydata)
+            if node is not None:
+                node.printInfo()
+
+    # Func: nearestNode(self, px, py)
+    # Finds the node closest to a position, within size in x and y, through
+    # the GridIndex made by showPlot.
+    # Params:   x, y in m
+    # returns:  myNode object or None
+    def nearestNode(self, px, py):
+        candidates = self.clickIndex.near(px, py)
+        dx = self.table.x[candidates] - px
+        dy = self.table.y[candidates] - py
+        within = (np.abs(dx) <= self.size) & (np.abs(dy) <= self.size)
+        if not within.any():
+            return None
+        distance = (dx * dx + dy * dy)[within]
+        return self.nodes[candidates[within][np.argmin(distance)]]
+
+    # Func: onZoom(self, ax)
+    # Called when the view of the plot changes. Markers are kept size m wide
+    # and nodes get their id as label once few enough of them are in view.
+    # Params:   Axes object
+    # returns:  None
+    def onZoom(self, ax):
+        self.nodeMarkers.set_sizes([markerArea(ax, self.fig.dpi, 2 * self.size)])
+        self.gatewayMarker.set_sizes([markerArea(ax, self.fig.dpi, 3 * self.size)])
+
+        for label in self.labels:
+            label.remove()
+        self.labels = []
+        x, y = self.table.x, self.table.y
+        (left, right), (bottom, top) = sorted(ax.get_xlim()), sorted(ax.get_ylim())
+        inView = np.flatnonzero((x >= left) & (x <= right) & (y >= bottom) & (y <= top))
+        if len(inView) <= maxLabels:
+            for i in inView:
+                self.labels.append(ax.annotate(int(i), (x[i] + self.width / 400, y[i] + self.width / 400), size=6))
+
+    # Func: reset(self, event)
+    # Is called by the onClick function. Resets all data and makes new plot.
+    # Params:   event
+    # returns:  None
+    def reset(self, event):
+        print("Resetting plot...")
+        self.setup(True)
+
+    # Func: randomPacketTillBattEmpty(self, event)
+    # Checks if any of the nodes are out of battery, if not send another random
+    # packet.
+    # Params:   event
+    # returns:  None
+    def randomPacketTillBattEmpty(self, event):
+        print("\nCalculating, please wait...")
+        result = self.run_until_empty()
+        if result is None:
+            print("No node has a connection to the gateway")
+            return
+
+        # print(self.nodes[result['node']].battery)                          ##DEBUG
+        print("Battery of node", result['node'], "is empty")
+        self.nodes[result['node']].printInfo()
+
+    # Func: printLifetime(self, event)
+    # Prints the expected lifetime of the network, see lifetime.
+    # Params:   event
+    # returns:  None
+    def printLifetime(self, event):
+        result = self.lifetime(100)
+        if result is None:
+            print("No node has a connection to the gateway")
+            return
+        if result['packets'] == 0:
+            print("\nBattery of node", result['node'], "is already empty")
+            return
+        print("\nExpected packets until first battery is empty:", result['packets'],
+              "(95% interval {:.0f} - {:.0f})".format(*result['packetsInterval']))
+        print("First node to run empty:", result['node'])
+        print("{:.2f}".format(result['days']), "days",
+              "(95% interval {:.2f} - {:.2f})".format(*result['daysInterval']))
+        if len(self.gateways) > 1:
+            for id, gateway in result['gateways'].items():
+                print("Gateway", id, "- first node to run empty:", gateway['node'],
+                      "after", gateway['packets'], "packets, {:.2f} days".format(gateway['days']))
 
     # Func: showPlot(reset)
     # Prepares plot and makes window in which to show the figure.
@@ -984,29 +3184,47 @@ class Index(object):
     # If reset = True, the plot will be cleared and filled with new data.
     # Params:   boolean
     # returns:  None
+    @timed('showPlot')
     def showPlot(self, reset):
+        import matplotlib.pyplot as plt
+        from matplotlib.widgets import Button
+        from matplotlib.collections import LineCollection
+        ax = self.ax
         if reset:
             ax.cla()
-        ax.set_xlim((0, width))
-        ax.set_ylim((0, height))
-
-        for node in nodes:
-            for connection in node.connectionLines:
-                ax.add_line(connection)
-            ax.add_artist(node.graphic)
-            ax.annotate(node.id, (node.x + width /400, node.y + width / 400), size=6)
-        ax.add_artist(GW.graphic)
+        ax.set_xlim((0, self.width))
+        ax.set_ylim((0, self.height))
+
+        """artists are only made here, one for all connections and one for
+           all nodes, red nodes are overflowed"""
+        table = self.table
+        ax.add_collection(LineCollection(connectionSegments(self), colors='r',
+                                         linestyles='--', linewidths=.5))
+        self.nodeMarkers = ax.scatter(table.x, table.y, s=1, linewidths=0,
+                                      c=np.where(table.overflow, 'red', 'blue'))
+        self.gatewayMarker = ax.scatter([GW.x for GW in self.gateways], [GW.y for GW in self.gateways],
+                                        s=1, linewidths=0, c='green')
+
+        """clicks are looked up in a grid of the nodes, see nearestNode"""
+        self.clickIndex = GridIndex(table.x, table.y, self.size)
+        self.labels = []
+        self.onZoom(ax)
+        ax.callbacks.connect('xlim_changed', self.onZoom)
+        ax.callbacks.connect('ylim_changed', self.onZoom)
 
-        cid = fig.canvas.mpl_connect('button_press_event', onclick)
         if reset:
             plt.draw()
         else:
-            breset = Button(axreset, 'Reset')
-            breset.on_clicked(callback.reset)
-            brandpacket = Button(axrandpacket, 'Random packet')
-            brandpacket.on_clicked(callback.sendRandomPacket)
-            bsendtillempty = Button(axsendtillempty, 'Send untill empty')
-            bsendtillempty.on_clicked(callback.randomPacketTillBattEmpty)
+            cid = self.fig.canvas.mpl_connect('button_press_event', self.onclick)
+            """keep the buttons, they stop working when garbage collected"""
+            self.buttons = []
+            for axes, label, callback in [(self.axreset, 'Reset', self.reset),
+                                          (self.axrandpacket, 'Random packet', self.sendRandomPacket),
+                                          (self.axsendtillempty, 'Send untill empty', self.randomPacketTillBattEmpty),
+                                          (self.axlifetime, 'Expected lifetime', self.printLifetime)]:
+                button = Button(axes, label)
+                button.on_clicked(callback)
+                self.buttons.append(button)
             plt.show()
 
     # Func: setup(reset)
@@ -1016,65 +3234,33 @@ class Index(object):
     # randomly generated again.
     # Params:   boolean
     # returns:  None
-    def setup(self, reset):
-        """add new nodes to nodes list"""
-        for i in range(0, nrNodesArg):
-            node = myNode(i, TXpowerArg, 868)
-            nodes.append(node)
-
-        """add beacon to the GW and send it to nodes"""
-        GW.addBeacon()
-
-        if self.beaconFromGW(GW):
-            print("Succesfully sent beacon")
-            self.beaconFromNodes()
-
-            for node in nodes:
-                node.traffic()
-                node.reroute()
-
-            mostTraffic = 0
-            for node in nodes:
-                traffic = node.traffic()
-                if traffic > mostTraffic:
-                    mostTraffic = traffic
-                if node.overflow:
-                    print("Overflow!!")
-                    node.graphic = plt.Circle((node.x, node.y), size, fill=True, color='red')
-                else:
-                    node.graphic = plt.Circle((node.x, node.y), size, fill=True, color='blue')
+    def setup(self, reset=False):
+        if self.untilTrafficIs != 0:
+            print("Searching topology with traffic", self.untilTrafficIs, "...")
+            """without a match the closest topology found is set up"""
+            chosen = self.search(searchTime)['chosen']
+            Simulation.setup(self, None if chosen is None else chosen['maxTraffic'])
+        else:
+            Simulation.setup(self)
 
-            if untilTrafficIsArg != 0 and\
-               mostTraffic != untilTrafficIsArg:
-                callback.resetUntill()
+        for i in range(np.count_nonzero(self.table.overflow)):
+            print("Overflow!!")
 
-            if reset:
-                self.showPlot(True)
-            else:
-                self.showPlot(False)
-                # print("\n")
+        if reset:
+            self.showPlot(True)
         else:
-            sys.exit(-1)
+            self.showPlot(False)
+            # print("\n")
 
-"""plot axis variables"""
-fig, ax = plt.subplots()
-axreset = plt.axes([0.58, 0.9, 0.1, 0.075])
-axrandpacket = plt.axes([0.7, 0.9, 0.2, 0.075])
-axsendtillempty = plt.axes([0.36, 0.9, 0.2, 0.075])
-
-"""parameters for plot and node size
+"""default field and node size of the plot, see Simulation.setField
    width and height is in meters."""
 width = 30000
 height = 30000
 size = width / 250
 
-"""1 to show nodes in plot"""
-graphics = 1
-
-"""list for all nodes"""
-nodes = []
-connections = []
-
+"""parent values in the routing table for the gateway and no connection"""
+TO_GATEWAY = -1
+NO_ROUTE = -2
 """list for available bandwidths"""
 BW = [125000, 250000]
 """list with datarates from lora specifications EU 868-870 MHz ISM band"""
@@ -1099,33 +3285,64 @@ V = 3.3                                                     # voltage XXX
 airAttenuation = 0.003
 
 maxTraffic = 4
+"""seconds the plot window searches for a topology with setupUntilTrafficIs,
+   after that it takes the closest one"""
+searchTime = 60
+"""topologies Simulation.setup tries to reach untilTrafficIs"""
+setupTries = 1000
+"""most nodes in view of the plot that still get a label"""
+maxLabels = 300
+
+"""time engine, see EventEngine: packets a node can hold, busy channels
+   before a packet is dropped and how many dB a packet has to be stronger than
+   another at the receiver to survive the overlap"""
+maxQueue = 8
+maxCADRetries = 8
+captureThreshold = 6
+
+
+# Func: main()
+# Reads the arguments from the command line and starts the simulation with
+# the plot window.
+# Params:   None
+# returns:  None
+def main():
+    """get arguments"""
+    if len(sys.argv) >= 7:
+        nrNodesArg          = int(sys.argv[1])
+        TXpowerArg          = int(sys.argv[2])
+        spreadingFactorArg  = int(sys.argv[3])
+        batteryCapacityArg  = int(sys.argv[4])
+        packetSizeArg       = int(sys.argv[5])
+        periodArg           = int(sys.argv[6])
+        untilTrafficIsArg   = int(sys.argv[7]) if len(sys.argv) >= 8 else 0
+
+        print("Number of nodes: \t",  nrNodesArg)
+        print("TX power: \t\t",         TXpowerArg)
+        print("Spreading factor: \t", spreadingFactorArg)
+        print("Battery capacity: \t", batteryCapacityArg)
+        print("Packet size: \t\t",    packetSizeArg)
+        print("Period: \t\t",           periodArg)
+        print("Setup until traffic is: ",     untilTrafficIsArg)
+    else:
+        print("Usage: ./LoRaSimSODAQ.py <numberOfNodes> <TXpower> <spreadingFactor> <batteryCapacity> <packetSize> <period> [setupUntilTrafficIs]")
+        sys.exit(-1)
+
+    if untilTrafficIsArg >= nrNodesArg:
+        print("setupUntilTrafficIs must be lower than the number of nodes")
+        sys.exit(-1)
+
+    """add callback funcionality"""
+    callback = Index(nrNodesArg, TXpowerArg, spreadingFactorArg, batteryCapacityArg,
+                     packetSizeArg, periodArg, untilTrafficIsArg)
+
+    """setup simulation for first time."""
+    try:
+        callback.setup(False)
+    except (ValueError, RuntimeError) as error:
+        print("ERROR:", error)
+        sys.exit(-1)
+
 
-"""get arguments"""
-if len(sys.argv) >= 7:
-    nrNodesArg          = int(sys.argv[1])
-    TXpowerArg          = int(sys.argv[2])
-    spreadingFactorArg  = int(sys.argv[3])
-    batteryCapacityArg  = int(sys.argv[4])
-    packetSizeArg       = int(sys.argv[5])
-    periodArg           = int(sys.argv[6])
-    untilTrafficIsArg   = int(sys.argv[7])
-
-    print("Number of nodes: \t",  nrNodesArg)
-    print("TX power: \t\t",         TXpowerArg)
-    print("Spreading factor: \t", spreadingFactorArg)
-    print("Battery capacity: \t", batteryCapacityArg)
-    print("Packet size: \t\t",    packetSizeArg)
-    print("Period: \t\t",           periodArg)
-    print("Setup until traffic is: ",     untilTrafficIsArg)
-else:
-    print("Usage: ./LoRaSimSODAQ.py <numberOfNodes> <TXpower> <spreadingFactor> <batteryCapacity> <packetSize> <period> <setupUntilTrafficIs>")
-    sys.exit(-1)
-
-"""start with making a new gateway"""
-GW = myGateway("G0", 868, width / 2, height / 2)
-
-"""add callback funcionality"""
-callback = Index()
-
-"""setup simulation for first time."""
-callback.setup(False)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+%=================================LoRaSweep.py=================================%
+Runs LoRaSimSODAQ.py for every combination of a grid of arguments, spread over
+a pool of worker processes, and collects the results in one table (csv file).
+No plots are made, see Simulation in LoRaSimSODAQ.py.
+
+USAGE:
+python3 ./LoRaSweep.py --nodes 50,100,200 --txpower 2:14:4 --sf 7,9,12
+                       --battery 1000 --size 20 --period 0,10 --out sweep.csv
+
+    Every argument takes one value, a list (a,b,c) or a range (start:stop:step,
+    stop included). Arguments left out get the value shown by --help.
+    Negative values work as --txpower -2,14 as well as --txpower=-2,14.
+    --workers   number of worker processes, default number of cores
+    --seed      base seed, every run gets a seed made from it and the arguments
+                of the run, so adding values to the grid keeps the old runs
+    --plots     directory to draw the topology of every run in, as
+                <arguments>-<seed>.png, see Simulation.render
+
+Every finished run is written to the table straight away. A sweep can be
+stopped with Ctrl+C; starting it again with the same table only does the runs
+that are not in it yet. A row left half written by a killed sweep is dropped
+from the table and run again.
+
+COLUMNS:
+    numberOfNodes, TXpower, spreadingFactor, batteryCapacity, packetSize,
+    period, seed        arguments of the run
+    connected           nodes with a route to the gateway
+    outOfRange          nodes out of range of all other nodes
+    maxHops, meanHops   hops to the gateway of the connected nodes
+    maxTraffic          most nodes behind a single node
+    overflowed          nodes with more traffic than maxTraffic
+    lifetimePackets     packets sent until the first battery is empty
+    lifetimeNode        node whose battery is empty first
+    lifetimeDays        days that node lasts
+%==============================================================================%
+"""
+
+import argparse
+import csv
+import functools
+import io
+import itertools
+import multiprocessing
+import os
+import re
+import sys
+import numpy as np
+
+from LoRaSimSODAQ import Simulation
+
+"""arguments of a run, in the order of the command line of LoRaSimSODAQ.py"""
+ARGUMENTS = ['numberOfNodes', 'TXpower', 'spreadingFactor', 'batteryCapacity',
+             'packetSize', 'period']
+"""results of a run"""
+RESULTS = ['connected', 'outOfRange', 'maxHops', 'meanHops', 'maxTraffic',
+           'overflowed', 'lifetimePackets', 'lifetimeNode', 'lifetimeDays']
+COLUMNS = ARGUMENTS + ['seed'] + RESULTS
+
+# Func: parseValues(text)
+# Reads the values of one argument: a single value, a list "a,b,c" or a range
+# "start:stop:step" with stop included.
+# Params:   string
+# returns:  list of integers
+def parseValues(text):
+    values = []
+    for part in text.split(','):
+        if ':' in part:
+            bounds = [int(value) for value in part.split(':')]
+            start, stop = bounds[0], bounds[1]
+            step = bounds[2] if len(bounds) > 2 else 1
+            values.extend(range(start, stop + 1, step))
+        else:
+            values.append(int(part))
+    return values
+
+# Func: runSeed(seed, values)
+# Makes the seed of a run from the base seed and the arguments of the run, so
+# a run keeps its seed whatever else is in the grid.
+# Params:   integer, base seed
+#           list of integers, argument values of the run
+# returns:  integer
+def runSeed(seed, values):
+    """SeedSequence only takes positive numbers, TXpower can be negative"""
+    entropy = [value % 2**32 for value in [seed] + list(values)]
+    return int(np.random.SeedSequence(entropy).generate_state(1)[0])
+
+# Func: makeGrid(ranges, seed)
+# Makes every combination of the argument values, each with its own seed.
+# Params:   dict with a list of values per name in ARGUMENTS
+#           integer, base seed
+# returns:  list of dicts with the arguments and seed of a run
+def makeGrid(ranges, seed):
+    grid = []
+    combinations = itertools.product(*[ranges[name] for name in ARGUMENTS])
+    for values in combinations:
+        run = dict(zip(ARGUMENTS, values))
+        run['seed'] = runSeed(seed, values)
+        grid.append(run)
+    return grid
+
+# Func: runKey(run)
+# Returns what identifies a run, to find the runs already in a table.
+# Params:   dict with at least the arguments and seed of a run
+# returns:  tuple of integers
+def runKey(run):
+    return tuple(int(run[name]) for name in ARGUMENTS + ['seed'])
+
+# Func: runScenario(run, plots)
+# Sets up a topology with the arguments of run and works out its statistics
+# and lifetime. Used by the worker processes.
+# Params:   dict with the arguments and seed of a run
+#           directory to draw the topology in, None for no image
+# returns:  dict with a value per name in COLUMNS
+def runScenario(run, plots=None):
+    sim = Simulation(*[run[name] for name in ARGUMENTS], seed=run['seed'])
+    sim.setup()
+    if plots is not None:
+        sim.render(os.path.join(plots, "-".join(str(value) for value in runKey(run)) + ".png"))
+
+    stats = sim.stats()
+    lifetime = sim.lifetime()
+    row = dict(run)
+    for name in RESULTS[:6]:
+        row[name] = stats[name]
+    if lifetime is not None:
+        row['lifetimePackets'] = lifetime['packets']
+        row['lifetimeNode'] = lifetime['node']
+        row['lifetimeDays'] = lifetime['days']
+    else:
+        row['lifetimePackets'] = row['lifetimeNode'] = row['lifetimeDays'] = ''
+    return row
+
+# Func: readTable(path)
+# Reads the runs that are already in a table. Rows that are not complete,
+# like the last one of a sweep killed while writing it, are dropped from the
+# file, so new rows are added after the complete ones.
+# Params:   path of the csv file
+# returns:  list of dicts, one per row
+def readTable(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, newline='') as file:
+        text = file.read()
+    """rows end with a line end, a row without one was not written to the end"""
+    written = text[:text.rfind('\n') + 1]
+
+    rows = []
+    read = 0
+    for row in csv.DictReader(io.StringIO(written)):
+        read += 1
+        if None in row or None in row.values():
+            continue
+        try:
+            runKey(row)
+        except ValueError:
+            continue
+        rows.append(row)
+
+    if written != text or len(rows) < read:
+        with open(path + '.tmp', 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=COLUMNS, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(path + '.tmp', path)
+    return rows
+
+# Func: joinNegativeValues(argv)
+# Joins an option and a value starting with a minus into --option=value.
+# argparse takes "-2,14" for an option, "--txpower=-2,14" is read right.
+# Params:   list of command line arguments
+# returns:  list of command line arguments
+def joinNegativeValues(argv):
+    joined = []
+    for arg in argv:
+        if joined and re.match(r'--\w+$', joined[-1]) and re.match(r'-[\d.]', arg):
+            joined[-1] += '=' + arg
+        else:
+            joined.append(arg)
+    return joined
+
+# Func: sweep(ranges, path, workers, seed, verbose, plots)
+# Runs every combination of ranges that is not in the table at path yet and
+# adds the results to it as they come in. Ctrl+C stops the workers, the runs
+# that were finished stay in the table.
+# Params:   dict with a list of values per name in ARGUMENTS
+#           path of the csv file
+#           number of worker processes, None for the number of cores
+#           integer, base seed
+#           boolean, True to print progress
+#           directory to draw the topology of every run in, None for no images
+# returns:  list of dicts, all rows in the table
+def sweep(ranges, path, workers=None, seed=0, verbose=False, plots=None):
+    done = readTable(path)
+    doneKeys = set(runKey(row) for row in done)
+    todo = [run for run in makeGrid(ranges, seed) if runKey(run) not in doneKeys]
+    if verbose:
+        print(len(doneKeys), "runs already done,", len(todo), "to go")
+    if not todo:
+        return done
+    if plots is not None:
+        os.makedirs(plots, exist_ok=True)
+
+    newFile = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, 'a', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=COLUMNS)
+        if newFile:
+            writer.writeheader()
+        pool = multiprocessing.Pool(workers or os.cpu_count())
+        try:
+            for row in pool.imap_unordered(functools.partial(runScenario, plots=plots), todo):
+                writer.writerow(row)
+                file.flush()
+                done.append(row)
+                if verbose:
+                    print("Done:", ", ".join("{}={}".format(name, row[name])
+                                             for name in ARGUMENTS + ['seed']))
+            pool.close()
+        except KeyboardInterrupt:
+            pool.terminate()
+            print("Sweep stopped, run again with the same table to resume")
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+    return done
+
+# Func: main()
+# Reads the arguments from the command line and runs the sweep.
+# Params:   None
+# returns:  None
+def main():
+    parser = argparse.ArgumentParser(description="Parameter sweep of LoRaSimSODAQ.py")
+    parser.add_argument('--nodes', default='100', help="numberOfNodes (default %(default)s)")
+    parser.add_argument('--txpower', default='14', help="TXpower in dBm (default %(default)s)")
+    parser.add_argument('--sf', default='7', help="spreadingFactor (default %(default)s)")
+    parser.add_argument('--battery', default='1000', help="batteryCapacity in mAh (default %(default)s)")
+    parser.add_argument('--size', default='20', help="packetSize in bytes (default %(default)s)")
+    parser.add_argument('--period', default='0', help="period in minutes (default %(default)s)")
+    parser.add_argument('--out', default='sweep.csv', help="table to write (default %(default)s)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default number of cores)")
+    parser.add_argument('--seed', type=int, default=0, help="base seed, the seed of a run is made from it and the arguments of the run (default %(default)s)")
+    parser.add_argument('--plots', default=None, help="directory to draw the topology of every run in")
+    args = parser.parse_args(joinNegativeValues(sys.argv[1:]))
+
+    ranges = {'numberOfNodes': parseValues(args.nodes),
+              'TXpower': parseValues(args.txpower),
+              'spreadingFactor': parseValues(args.sf),
+              'batteryCapacity': parseValues(args.battery),
+              'packetSize': parseValues(args.size),
+              'period': parseValues(args.period)}
+    rows = sweep(ranges, args.out, args.workers, args.seed, verbose=True, plots=args.plots)
+    print(len(rows), "runs in", args.out)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
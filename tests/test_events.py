@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the event engine of LoRaSimSODAQ.py, see Simulation.run_events.
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from LoRaSimSODAQ import Simulation
+
+
+class EventEngineTest(unittest.TestCase):
+    def test_no_nodes(self):
+        sim = Simulation(0, 14, 7, 1000, 20, 10, seed=1)
+        sim.setup()
+        result = sim.run_events(days=1)
+        self.assertEqual(result['generated'], 0)
+        self.assertEqual(result['delivered'], 0)
+        self.assertEqual(result['deliveryRatio'], 0.0)
+        self.assertIsNone(result['firstDeath'])
+        self.assertEqual(len(sim.table.sent), 0)
+        self.assertEqual(sim.table.sent.dtype.kind, 'i')
+        self.assertEqual(sim.table.received.dtype.kind, 'i')
+
+    def test_packets_add_up(self):
+        sim = Simulation(50, 14, 7, 1000, 20, 10, seed=1)
+        sim.setup()
+        result = sim.run_events(days=1)
+        self.assertGreater(result['generated'], 0)
+        """every hop sent ends at a node, at a gateway or in a collision"""
+        self.assertLessEqual(result['delivered'] + result['collisions'], int(sim.table.sent.sum()))
+        self.assertEqual(sum(result['deliveredAt'].values()), result['delivered'])
+
+
+if __name__ == '__main__':
+    unittest.main()